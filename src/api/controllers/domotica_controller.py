@@ -8,7 +8,7 @@ obtenidos mediante web scraping desde el sistema Domotica INC.
 from fastapi import APIRouter, Response, WebSocket, WebSocketDisconnect, BackgroundTasks, HTTPException, status
 from typing import Dict, List, Any
 
-from src.model.schemas import ProductoDomotica, MesaDomotica, HealthResponse, PlatoInsertRequest, PlatoInsertResponse
+from src.model.schemas import ProductoDomotica, MesaDomotica, CatalogoDomotica, HealthResponse, PlatoInsertRequest, PlatoInsertResponse
 from src.service import domotica_service
 from src.service.scheduler_service import SchedulerService
 
@@ -50,7 +50,7 @@ async def obtener_productos() -> List[ProductoDomotica]:
     Returns:
         List[ProductoDomotica]: Lista de productos con su información
     """
-    return domotica_service.scrape_and_get_productos()
+    return await domotica_service.scrape_and_get_productos()
 
 
 @router.get("/mesas", response_model=List[MesaDomotica], tags=["Mesas"])
@@ -70,7 +70,22 @@ async def obtener_mesas() -> List[MesaDomotica]:
     Returns:
         List[MesaDomotica]: Lista de mesas con su información
     """
-    return domotica_service.scrape_and_get_mesas()
+    return await domotica_service.scrape_and_get_mesas()
+
+
+@router.get("/catalogo", response_model=CatalogoDomotica, tags=["Productos", "Mesas"])
+async def obtener_catalogo() -> CatalogoDomotica:
+    """
+    Obtiene productos y mesas en una sola llamada.
+
+    Ambos scrapings se ejecutan en paralelo, cada uno con su propio navegador,
+    por lo que la respuesta tarda lo mismo que el más lento de los dos.
+
+    Returns:
+        CatalogoDomotica: Productos y mesas con su información
+    """
+    productos, mesas = await domotica_service.scrape_all()
+    return CatalogoDomotica.model_construct(productos=productos, mesas=mesas)
 
 
 @router.post("/platos", response_model=PlatoInsertResponse, tags=["Platos"])
@@ -100,7 +115,7 @@ async def insertar_plato(plato_data: PlatoInsertRequest, response: Response, hea
         400: Proceso completado pero con errores/warnings
         500: Error crítico que impidió completar el proceso
     """
-    result = domotica_service.insertar_plato(plato_data, headless=headless)
+    result = await domotica_service.insertar_plato(plato_data, headless=headless)
     
     # Determinar status code basado en el resultado
     if not result.success:
@@ -58,6 +58,8 @@ class Settings(BaseSettings):
 
     # Domotica INC Scraping
     api_base_url: str
+    api_sync_chunk_size: int = 0  # Platos por POST de sincronización (0 = todos en uno)
+    api_sync_gzip: bool = False  # Comprimir con gzip los POST grandes (la API debe soportarlo)
     domotica_base_url: str
     domotica_username: str
     domotica_password: str
@@ -65,6 +67,9 @@ class Settings(BaseSettings):
     domotica_scrape_interval: int = (
         300  # Intervalo de actualización en segundos (5 minutos)
     )
+    domotica_pool_size: int = 2  # Navegadores reutilizables simultáneos
+    domotica_scrape_cache_ttl: int = 60  # Segundos que se reutiliza un scraping (0 desactiva)
+    domotica_max_concurrent_scrapes: int = 2  # Scrapings simultáneos en hilos
 
     # CORS
     allowed_origins: str = "*"
@@ -104,6 +109,7 @@ class Settings(BaseSettings):
     rabbitmq_queue: str = "domotica_queue"
     rabbitmq_screenshot_exchange: str = "domotica_exchange_screenshot"
     rabbitmq_screenshot_queue: str = "domotica_queue_screenshot"
+    rabbitmq_prefetch_count: int = 2  # Tareas procesadas en paralelo por el consumer
 
     # Eliminamos los field_validators que estaban causando problemas
 
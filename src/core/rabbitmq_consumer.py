@@ -1,6 +1,7 @@
 import json
 import logging
 import asyncio
+import random
 import aio_pika
 from aio_pika.abc import AbstractIncomingMessage
 from src.core.config import get_settings
@@ -22,8 +23,11 @@ class RabbitMQConsumer:
         rabbitmq_url = f"amqp://{settings.rabbitmq_user}:{settings.rabbitmq_password}@{settings.rabbitmq_host}:{settings.rabbitmq_port}/{settings.rabbitmq_vhost}"
         
         try:
-            self.connection = await aio_pika.connect_robust(rabbitmq_url)
+            self.connection = await self._connect_with_retry(rabbitmq_url)
             self.channel = await self.connection.channel()
+
+            # Limitar las tareas en vuelo: cada una abre su propio navegador
+            await self.channel.set_qos(prefetch_count=settings.rabbitmq_prefetch_count)
             
             # Declarar Exchange
             exchange = await self.channel.declare_exchange(
@@ -47,6 +51,21 @@ class RabbitMQConsumer:
         except Exception as e:
             logger.error(f"Error conectando a RabbitMQ: {e}")
 
+    async def _connect_with_retry(self, rabbitmq_url: str, attempts: int = 5):
+        """Abre la conexión reintentando fallos transitorios con backoff exponencial y jitter"""
+        for attempt in range(attempts):
+            try:
+                return await aio_pika.connect_robust(rabbitmq_url)
+            except (aio_pika.exceptions.AMQPConnectionError, OSError, asyncio.TimeoutError) as e:
+                if attempt == attempts - 1:
+                    raise
+                delay = min(30, 0.5 * 2**attempt) + random.random() * 0.25
+                logger.warning(
+                    f"RabbitMQ no disponible (intento {attempt + 1}/{attempts}): {e}. "
+                    f"Reintentando en {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+
     async def process_message(self, message: AbstractIncomingMessage):
         """Procesa cada mensaje recibido"""
         async with message.process():
@@ -64,9 +83,8 @@ class RabbitMQConsumer:
                         # Convertir payload a modelo Pydantic
                         plato_request = PlatoInsertRequest(**payload)
                         
-                        # Ejecutar en un hilo separado para no bloquear el loop async
-                        response = await asyncio.to_thread(
-                            domotica_service.insertar_plato, 
+                        # El servicio ejecuta Selenium en un hilo separado
+                        response = await domotica_service.insertar_plato(
                             plato_request,
                             headless=True
                         )
@@ -81,9 +99,8 @@ class RabbitMQConsumer:
                     
                 elif task_type == "sync":
                     logger.info("🔄 Ejecutando sincronización manual...")
-                    # Ejecutar en hilo separado
-                    await asyncio.to_thread(self.scheduler.sync_platos)
-                    await asyncio.to_thread(self.scheduler.sync_mesas)
+                    # Ejecutar en hilo separado, con una sola sesión del navegador
+                    await asyncio.to_thread(self.scheduler.sync_all)
                     logger.info("✅ Sincronización completada")
                 
                 else:
@@ -2,14 +2,17 @@
 Punto de entrada principal de la aplicación FastAPI para Domotica Scrapper.
 """
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from src.core.config import get_settings
 from src.core.logging import configure_logging
+from src.service import domotica_service
 from src.service.scheduler_service import SchedulerService
 from src.core.rabbitmq_consumer import RabbitMQConsumer
 
@@ -42,7 +45,7 @@ async def lifespan(app: FastAPI):
     # Fase de inicialización
     logger.info("Iniciando Domotica Scrapper API...")
 
-    # Iniciar el scheduler para sync_platos
+    # Iniciar el scheduler para sync_all (mesas y platos)
     logger.info("Iniciando el servicio de sincronización de platos...")
     if scheduler.start("00:00"):  # Sincronizar cada día a medianoche
         logger.info("Servicio de sincronización iniciado correctamente")
@@ -52,6 +55,7 @@ async def lifespan(app: FastAPI):
     # Iniciar RabbitMQ Consumer
     logger.info("Iniciando RabbitMQ Consumer...")
     await rabbitmq_consumer.connect()
+    await domotica_service.start_screenshot_publisher()
 
     logger.info("Domotica Scrapper API iniciada correctamente")
 
@@ -63,10 +67,16 @@ async def lifespan(app: FastAPI):
     # Detener el scheduler
     if scheduler.is_running:
         logger.info("Deteniendo el servicio de sincronización...")
-        scheduler.stop()
+        # stop() espera a una sincronización en curso: no bloquear el event loop
+        await asyncio.to_thread(scheduler.stop)
 
     # Cerrar RabbitMQ Consumer
     await rabbitmq_consumer.close()
+    await domotica_service.close_screenshot_publisher()
+
+    # Cerrar los navegadores reutilizables del servicio de scraping
+    logger.info("Cerrando navegadores del pool de scraping...")
+    domotica_service.close_driver_pool()
 
     # Aquí se pueden cerrar otras conexiones y liberar recursos
     logger.info("Recursos liberados correctamente")
@@ -95,6 +105,7 @@ def create_app() -> FastAPI:
         debug=settings.debug,
         lifespan=lifespan,
         root_path="/scrapper",
+        default_response_class=ORJSONResponse,
     )
 
     # Agregar middleware CORS
@@ -120,7 +131,8 @@ def create_app() -> FastAPI:
         dict
             Resultado de la sincronización
         """
-        result = scheduler.sync_platos()
+        # Scraping bloqueante: ejecutarlo fuera del event loop
+        result = await asyncio.to_thread(scheduler.sync_platos)
         if not result:
             response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
             return {"status": "error", "message": "La sincronización falló"}
@@ -136,7 +148,8 @@ def create_app() -> FastAPI:
         dict
             Resultado de la sincronización
         """
-        result = scheduler.sync_mesas()
+        # Scraping bloqueante: ejecutarlo fuera del event loop
+        result = await asyncio.to_thread(scheduler.sync_mesas)
         if not result:
             response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
             return {"status": "error", "message": "La sincronización falló"}
@@ -163,6 +163,18 @@ class MesaDomotica(BaseModel):
         return MesaEstadoEnum.from_str(str(value))
 
 
+class CatalogoDomotica(BaseModel):
+    """
+    Modelo para la respuesta combinada de productos y mesas.
+    """
+
+    productos: List[ProductoDomotica]
+    """Lista de productos extraídos"""
+
+    mesas: List[MesaDomotica]
+    """Lista de mesas extraídas"""
+
+
 class HealthResponse(BaseModel):
     """
     Modelo para la respuesta del endpoint de health check.
@@ -303,7 +315,10 @@ class PlatoInsertResponse(BaseModel):
     """Lista de todos los errores acumulados durante el proceso"""
     
     screenshot: Optional[str] = None
-    """Captura de pantalla en base64 después de llenar los datos del comprobante"""
+    """Captura de pantalla en base64 después de llenar los datos del comprobante (JPEG, o PNG si falla la captura por CDP)"""
+
+    screenshot_mime: Optional[str] = None
+    """Tipo MIME de la captura: image/jpeg o image/png"""
 
     model_config = {
         "json_schema_extra": {
@@ -320,7 +335,8 @@ class PlatoInsertResponse(BaseModel):
                         "Proceso completado - 3/3 platos insertados"
                     ],
                     "errors": [],
-                    "screenshot": "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+                    "screenshot": "/9j/4AAQSkZJRgABAQAAAQABAAD/2wBDAAgGBgcGBQgHBwcJCQgKDBQNDAsLDBkSEw8U...",
+                    "screenshot_mime": "image/jpeg"
                 }
             ]
         }
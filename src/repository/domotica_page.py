@@ -2,17 +2,18 @@
 Módulo de acceso a la plataforma Domotica Perú.
 
 Este módulo proporciona una interfaz para automatizar la navegación y scraping
-del sitio web de Domotica Perú utilizando Selenium y BeautifulSoup.
+del sitio web de Domotica Perú utilizando Selenium y lxml.
 """
 
 import base64
 import logging
 import re
 import time
-import urllib.parse
 from contextlib import contextmanager
-from typing import Dict, Iterator, List, Optional, Type, Any
+from typing import ClassVar, Dict, Iterator, List, Optional, Tuple, Type, Any
 
+import lxml.etree
+import lxml.html
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
@@ -20,8 +21,6 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from bs4 import BeautifulSoup
-from bs4.element import Tag
 
 from src.core.config import get_settings
 from src.model.schemas import MesaDomotica, MesaEstadoEnum, ProductoDomotica
@@ -30,11 +29,47 @@ from src.model.schemas import MesaDomotica, MesaEstadoEnum, ProductoDomotica
 logger = logging.getLogger(__name__)
 
 
+def _has_class(class_name: str) -> str:
+    """Construye un predicado XPath que compara una clase CSS completa."""
+    return f'contains(concat(" ", normalize-space(@class), " "), " {class_name} ")'
+
+
+def _node_text(element: lxml.html.HtmlElement) -> str:
+    """
+    Devuelve el texto sin espacios extremos de un nodo lxml.
+
+    Las celdas hoja (el caso habitual) se resuelven con ``element.text`` sin
+    recorrer descendientes; solo los nodos con hijos usan ``text_content()``.
+    """
+    text = element.text
+    if text is not None and not len(element):
+        return text.strip()
+    return element.text_content().strip()
+
+
+# XPaths compilados una sola vez y reutilizados en cada extracción
+_TABLE_ROWS_XPATH = lxml.etree.XPath(".//tbody/tr")
+_MESA_CARDS_XPATH = lxml.etree.XPath(f"//div[{_has_class('v-card--link')}]")
+_MESA_CARD_TEXT_XPATH = lxml.etree.XPath(f".//div[{_has_class('v-card__text')}]")
+_MESA_NUMERO_XPATH = lxml.etree.XPath(f".//h2[{_has_class('black--text')}]")
+_MESA_ESTADO_XPATH = lxml.etree.XPath(f".//p[{_has_class('white--text')}]")
+
+# Colores de fondo de las tarjetas de mesa y el estado que representan
+_ESTADO_POR_COLOR = {
+    "70, 255, 0": "Disponible",  # Verde
+    "255, 45, 0": "Ocupada",  # Rojo
+    "255, 241, 0": "Reservada",  # Amarillo
+}
+_ESTADO_COLOR_RE = re.compile(
+    r"rgb\((" + "|".join(map(re.escape, _ESTADO_POR_COLOR)) + r")\)"
+)
+
+
 class DomoticaPage:
     """
     Clase para automatizar la navegación y el scraping del sitio Domotica Perú.
 
-    Esta clase utiliza Selenium para automatizar la navegación web y BeautifulSoup
+    Esta clase utiliza Selenium para automatizar la navegación web y lxml
     para extraer datos de las páginas de manera más eficiente. Implementa métodos
     para iniciar sesión, navegar por el sitio y extraer información relevante.
 
@@ -52,6 +87,9 @@ class DomoticaPage:
         Tiempo máximo de espera para operaciones en el navegador
     """
 
+    # Metadatos de mesas compartidos entre instancias: (instante monotónico, datos)
+    _mesas_metadata_cache: ClassVar[Optional[Tuple[float, Dict[str, MesaDomotica]]]] = None
+
     def __init__(self, username: Optional[str] = None, password: Optional[str] = None, headless: Optional[bool] = None):
         """
         Inicializa la clase DomoticaPage con credenciales y configura el driver.
@@ -73,10 +111,12 @@ class DomoticaPage:
         """
         settings = get_settings()
 
-        self.username = username or settings.domotica_username
-        self.password = password or settings.domotica_password
-        self.base_url = settings.domotica_base_url
-        self.timeout = settings.domotica_timeout
+        self.username, self.password, self.base_url, self.timeout = (
+            username or settings.domotica_username,
+            password or settings.domotica_password,
+            settings.domotica_base_url,
+            settings.domotica_timeout,
+        )
         self.logged_in = False
 
         # Configurar opciones de Chrome optimizadas para scraping
@@ -106,6 +146,33 @@ class DomoticaPage:
         logger.info(f"Inicializando WebDriver para {self.base_url}")
         self.driver = webdriver.Chrome(options=chrome_options)
         self.driver.set_page_load_timeout(self.timeout)
+
+        # Desactivar transiciones y animaciones CSS en cada documento nuevo para
+        # que element_to_be_clickable no espere a que terminen las animaciones
+        try:
+            self.driver.execute_cdp_cmd(
+                "Page.addScriptToEvaluateOnNewDocument",
+                {
+                    "source": """
+                    const addNoAnimationStyle = () => {
+                        const style = document.createElement('style');
+                        style.textContent = '*, *::before, *::after { transition: none !important; animation: none !important; }';
+                        document.documentElement.appendChild(style);
+                    };
+                    if (document.documentElement) {
+                        addNoAnimationStyle();
+                    } else {
+                        document.addEventListener('DOMContentLoaded', addNoAnimationStyle);
+                    }
+                    """
+                },
+            )
+        except Exception as cdp_err:
+            logger.warning(f"No se pudieron desactivar las animaciones CSS: {cdp_err}")
+
+        # Esperas reutilizables con sondeo más frecuente que el por defecto (0.5 s)
+        self._wait = WebDriverWait(self.driver, self.timeout, poll_frequency=0.2)
+        self._short_wait = WebDriverWait(self.driver, 5, poll_frequency=0.1)
         self.driver.get(self.base_url)
         logger.debug("WebDriver inicializado y página cargada")
 
@@ -130,7 +197,7 @@ class DomoticaPage:
 
         try:
             logger.debug("Esperando campos de inicio de sesión")
-            user_input = WebDriverWait(self.driver, self.timeout).until(
+            user_input = self._wait.until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, 'input[type="text"]'))
             )
 
@@ -157,7 +224,7 @@ class DomoticaPage:
 
             # Espera a que la URL cambie al panel después del login
             logger.debug("Esperando redirección al panel de control")
-            WebDriverWait(self.driver, self.timeout).until(EC.url_contains("/panel"))
+            self._wait.until(EC.url_contains("/panel"))
             self.logged_in = True
             logger.info("Inicio de sesión exitoso")
 
@@ -212,7 +279,7 @@ class DomoticaPage:
 
             try:
                 # Método 1: Buscar directamente por el texto "Mesas" en un h4
-                mesa_option = WebDriverWait(self.driver, self.timeout).until(
+                mesa_option = self._wait.until(
                     EC.element_to_be_clickable(
                         (By.XPATH, "//h4[contains(text(), 'Mesas')]")
                     )
@@ -221,7 +288,7 @@ class DomoticaPage:
 
             except TimeoutException:
                 # Método 2: Intentar encontrar por la estructura de la tarjeta con imagen de mesa
-                mesa_option = WebDriverWait(self.driver, self.timeout).until(
+                mesa_option = self._wait.until(
                     EC.element_to_be_clickable(
                         (
                             By.XPATH,
@@ -236,7 +303,7 @@ class DomoticaPage:
             mesa_option.click()
 
             # Esperar a que cargue la página de mesas
-            WebDriverWait(self.driver, self.timeout).until(
+            self._wait.until(
                 EC.presence_of_element_located(
                     (By.XPATH, "//div[contains(@class, 'v-card')]//h2")
                 )
@@ -356,7 +423,7 @@ class DomoticaPage:
                 logger.debug(f"No se encontró o no se pudo hacer clic en 'Editar': {editar_err}")
 
             # Esperar a que cargue la interfaz de la mesa (pueden ser categorías de productos)
-            WebDriverWait(self.driver, self.timeout).until(
+            self._wait.until(
                 EC.any_of(
                     EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'v-toolbar__title')]")),
                     EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'v-card v-card--link')]")),
@@ -407,7 +474,7 @@ class DomoticaPage:
                     )
                 except TimeoutException:
                     # Método 3: Por autofocus
-                    search_input = WebDriverWait(self.driver, 5).until(
+                    search_input = self._short_wait.until(
                         EC.element_to_be_clickable(
                             (By.XPATH, "//input[@autofocus and @type='text']")
                         )
@@ -426,14 +493,14 @@ class DomoticaPage:
             for search_retry in range(3):
                 try:
                     # Esperar menú de resultados
-                    menu_content = WebDriverWait(self.driver, 5).until(
+                    menu_content = self._short_wait.until(
                         EC.presence_of_element_located(
                             (By.XPATH, "//div[contains(@class, 'v-menu__content') and contains(@class, 'menuable__content__active')]")
                         )
                     )
                     
                     # Hacer clic en primer resultado
-                    first_result = WebDriverWait(self.driver, 5).until(
+                    first_result = self._short_wait.until(
                         EC.element_to_be_clickable(
                             (By.XPATH, "//div[contains(@class, 'v-menu__content') and contains(@class, 'menuable__content__active')]//div[@role='option' and contains(@class, 'v-list-item')][1]")
                         )
@@ -469,7 +536,7 @@ class DomoticaPage:
             # Cerrar popup si aparece
             try:
                 # Esperar popup
-                WebDriverWait(self.driver, 5).until(
+                self._short_wait.until(
                     EC.any_of(
                         EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'v-dialog') and contains(@class, 'v-dialog--active')]")),
                         EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'v-overlay--active')]")),
@@ -646,6 +713,248 @@ class DomoticaPage:
             logger.warning(f"⚠️ Error insertando producto '{product_name}': {str(e)}")
             return False
 
+    def insert_products_batch(self, productos: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Inserta varios productos en la mesa con un único script asíncrono en el navegador.
+
+        Equivale a llamar a ``insert_product_in_search`` por cada producto, pero
+        todo el bucle (búsqueda, selección del resultado, observación, cantidad y
+        botón OK) se ejecuta dentro del navegador, evitando un viaje de ida y
+        vuelta a Selenium por cada paso y las pausas fijas entre productos.
+
+        Args:
+            productos: Lista de diccionarios con las claves ``nombre``,
+                ``cantidad`` y ``comentario``
+
+        Returns:
+            List[Dict[str, Any]]: Un resultado por producto, en el mismo orden,
+                con las claves ``ok`` (bool, o None si el estado es desconocido)
+                y ``error`` (str o None)
+        """
+        if not productos:
+            return []
+
+        batch_script = """
+        const items = arguments[0];
+        const done = arguments[arguments.length - 1];
+        const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+        // Sondear una condición del DOM hasta que devuelva un valor o se agote el tiempo
+        const waitFor = async (condition, timeout) => {
+            const end = Date.now() + timeout;
+            while (Date.now() < end) {
+                const value = condition();
+                if (value) {
+                    return value;
+                }
+                await sleep(50);
+            }
+            return null;
+        };
+
+        // Asignar el valor con el setter nativo para que Vue detecte el cambio
+        const setValue = (element, value) => {
+            const proto = element.tagName === 'TEXTAREA'
+                ? HTMLTextAreaElement.prototype
+                : HTMLInputElement.prototype;
+            Object.getOwnPropertyDescriptor(proto, 'value').set.call(element, value);
+            element.dispatchEvent(new Event('input', { bubbles: true }));
+            element.dispatchEvent(new Event('change', { bubbles: true }));
+        };
+
+        const findSearchInput = () => {
+            const label = [...document.querySelectorAll('label')]
+                .find((l) => l.textContent.includes('Buscar Productos'));
+            return (label && label.parentElement.querySelector('input[type="text"]'))
+                || document.querySelector('div.v-select__slot input[type="text"][autocomplete="off"]')
+                || document.querySelector('input[autofocus][type="text"]');
+        };
+
+        const activeDialog = () => document.querySelector('div.v-dialog.v-dialog--active');
+
+        const insertItem = async (item) => {
+            const input = await waitFor(findSearchInput, 10000);
+            if (!input) {
+                return { ok: false, error: 'Campo de búsqueda no encontrado' };
+            }
+            input.focus();
+            setValue(input, '');
+            setValue(input, item.nombre);
+
+            const option = await waitFor(() => document.querySelector(
+                'div.v-menu__content.menuable__content__active div[role="option"].v-list-item'
+            ), 5000);
+            if (option) {
+                option.click();
+            } else {
+                // Mismo respaldo que la inserción individual: presionar Enter
+                input.dispatchEvent(new KeyboardEvent('keydown', {
+                    key: 'Enter', keyCode: 13, which: 13, bubbles: true
+                }));
+            }
+
+            const dialog = await waitFor(activeDialog, 5000);
+            if (!dialog) {
+                return option
+                    ? { ok: true, error: null }
+                    : { ok: false, error: 'No se encontró el producto en la búsqueda' };
+            }
+
+            const observacionLabel = [...dialog.querySelectorAll('label')]
+                .find((l) => l.textContent.trim() === 'Observacion');
+            const observacion = (observacionLabel && observacionLabel.parentElement.querySelector('textarea'))
+                || dialog.querySelector('textarea');
+            if (observacion) {
+                setValue(observacion, item.comentario);
+            }
+
+            const cantidad = dialog.querySelector('input[autofocus][type="number"]')
+                || dialog.querySelector('input[type="number"]');
+            if (cantidad) {
+                setValue(cantidad, item.cantidad);
+            }
+
+            const okButton = [...document.querySelectorAll('button')].find((b) => {
+                const content = b.querySelector('span.v-btn__content');
+                return content && content.textContent.trim() === 'OK';
+            });
+            if (okButton) {
+                okButton.click();
+            } else {
+                document.body.dispatchEvent(new KeyboardEvent('keydown', {
+                    key: 'Escape', keyCode: 27, which: 27, bubbles: true
+                }));
+            }
+
+            await waitFor(() => !activeDialog(), 5000);
+            return okButton
+                ? { ok: true, error: null }
+                : { ok: false, error: 'No se encontró el botón OK' };
+        };
+
+        (async () => {
+            // Progreso visible desde Python para recuperar resultados parciales
+            const results = window.__domoticaBatchResults = [];
+            window.__domoticaBatchAbort = false;
+            window.__domoticaBatchDone = false;
+            for (const item of items) {
+                if (window.__domoticaBatchAbort) {
+                    break;
+                }
+                try {
+                    results.push(await insertItem(item));
+                } catch (e) {
+                    results.push({ ok: false, error: String(e) });
+                }
+                await sleep(50);
+            }
+            window.__domoticaBatchDone = true;
+            done(results);
+        })();
+        """
+
+        previous_timeout = self.driver.timeouts.script
+        try:
+            logger.info(f"Insertando {len(productos)} productos en lote")
+            # Limpiar el estado de un lote anterior en la misma página
+            self.driver.execute_script(
+                "window.__domoticaBatchResults = undefined;"
+                "window.__domoticaBatchDone = undefined;"
+            )
+            # Margen de 30 s por producto para el peor caso de todas las esperas
+            self.driver.set_script_timeout(30 * len(productos))
+            return self.driver.execute_async_script(batch_script, productos)
+        except Exception as e:
+            logger.warning(f"⚠️ Error en la inserción por lote: {str(e)}")
+            return self._partial_batch_results(len(productos), str(e))
+        finally:
+            # El driver vuelve al pool: no dejarle el timeout ampliado
+            try:
+                self.driver.set_script_timeout(previous_timeout)
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo restaurar el script timeout: {str(e)}")
+
+    def _partial_batch_results(self, total: int, error: str) -> List[Dict[str, Any]]:
+        """
+        Recupera los resultados ya registrados por un lote que falló o expiró.
+
+        Tras un timeout el script del lote puede seguir corriendo en la página:
+        se le pide detenerse antes del siguiente producto y se espera a que
+        confirme que terminó, para no perder el resultado del producto en curso.
+        Si no llega a confirmarlo, ese producto queda con estado desconocido
+        (``ok`` en None); los productos que el script nunca llegó a empezar se
+        marcan como fallidos.
+
+        Args:
+            total: Número de productos del lote
+            error: Mensaje de error para los productos sin resultado
+
+        Returns:
+            List[Dict[str, Any]]: Un resultado por producto, en el mismo orden
+        """
+        partial: List[Dict[str, Any]] = []
+        finished = False
+        try:
+            self.driver.execute_script("window.__domoticaBatchAbort = true;")
+            # Done en undefined: el script nunca empezó, no hay nada que esperar
+            WebDriverWait(self.driver, 30, poll_frequency=0.2).until(
+                lambda d: d.execute_script("return window.__domoticaBatchDone !== false;")
+            )
+            finished = True
+        except TimeoutException:
+            logger.warning("⚠️ El lote no confirmó su finalización tras pedir que se detuviera")
+        except Exception as abort_err:
+            logger.warning(f"⚠️ No se pudo detener el lote: {str(abort_err)}")
+
+        try:
+            partial = self.driver.execute_script("return window.__domoticaBatchResults || [];") or []
+        except Exception as read_err:
+            logger.warning(f"⚠️ No se pudieron leer los resultados parciales: {str(read_err)}")
+            finished = False
+
+        partial = partial[:total]
+        logger.info(f"Resultados parciales del lote: {len(partial)}/{total} productos procesados")
+        missing = total - len(partial)
+        if finished or not missing:
+            return partial + [{"ok": False, "error": error} for _ in range(missing)]
+
+        # Sin confirmación, el producto en curso pudo haberse insertado igual
+        unknown = {"ok": None, "error": f"Estado desconocido: {error}"}
+        return partial + [unknown] + [{"ok": False, "error": error} for _ in range(missing - 1)]
+
+    def wait_for_search_ready(self, timeout: float = 2.0) -> bool:
+        """
+        Espera a que la vista de la mesa quede lista para la siguiente acción.
+
+        Se considera lista cuando no hay diálogos ni overlays activos y el
+        campo de búsqueda de productos está vacío. Reemplaza las pausas fijas
+        de estabilización: en el caso normal retorna en pocos milisegundos.
+
+        Args:
+            timeout: Tiempo máximo de espera en segundos
+
+        Returns:
+            bool: True si la vista quedó lista, False si se agotó el tiempo
+        """
+        ready_script = """
+        if (document.querySelector('.v-dialog--active, .v-overlay--active')) {
+            return false;
+        }
+        const input = document.querySelector('div.v-select__slot input[type="text"]');
+        return !input || input.value === '';
+        """
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=0.05).until(
+                lambda d: d.execute_script(ready_script)
+            )
+            return True
+        except TimeoutException:
+            logger.warning("⚠️ La vista no quedó lista a tiempo, se continúa igualmente")
+            return False
+        except Exception as e:
+            logger.warning(f"⚠️ Error esperando la vista de la mesa: {str(e)}")
+            return False
+
     def open_comprobante_modal(self) -> bool:
         """
         Hace clic en el botón mdi-account-plus para abrir el modal de comprobante electrónico.
@@ -673,7 +982,7 @@ class DomoticaPage:
             except TimeoutException:
                 # Método 2: Buscar solo por el ícono mdi-account-plus
                 try:
-                    comprobante_button = WebDriverWait(self.driver, 5).until(
+                    comprobante_button = self._short_wait.until(
                         EC.element_to_be_clickable(
                             (By.XPATH, "//button[contains(@class, 'mdi-account-plus')]")
                         )
@@ -681,7 +990,7 @@ class DomoticaPage:
                     logger.debug("Botón de comprobante encontrado por ícono")
                 except TimeoutException:
                     # Método 3: Buscar cualquier elemento con mdi-account-plus
-                    comprobante_button = WebDriverWait(self.driver, 5).until(
+                    comprobante_button = self._short_wait.until(
                         EC.element_to_be_clickable(
                             (By.XPATH, "//*[contains(@class, 'mdi-account-plus')]")
                         )
@@ -747,7 +1056,7 @@ class DomoticaPage:
             
             for verify_retry in range(3):
                 try:
-                    WebDriverWait(self.driver, 5).until(
+                    self._short_wait.until(
                         EC.presence_of_element_located(
                             (By.XPATH, "//h4[contains(text(), 'Datos para Comprobante Electronico')]")
                         )
@@ -773,6 +1082,27 @@ class DomoticaPage:
             logger.error(f"Error al abrir modal de comprobante: {str(e)}")
             return False
 
+    def _capture_screenshot(self) -> bytes:
+        """
+        Captura la pantalla actual como JPEG usando Chrome DevTools.
+
+        ``Page.captureScreenshot`` en JPEG es bastante más rápido de codificar
+        y pesa menos que el PNG de Selenium. Si el comando CDP falla se usa la
+        captura PNG estándar.
+
+        Returns:
+            bytes: Imagen JPEG, o PNG si se usó el respaldo
+        """
+        try:
+            result = self.driver.execute_cdp_cmd(
+                "Page.captureScreenshot",
+                {"format": "jpeg", "quality": 80, "captureBeyondViewport": False},
+            )
+            return base64.b64decode(result["data"])
+        except Exception as e:
+            logger.warning(f"⚠️ Captura CDP no disponible, usando PNG: {str(e)}")
+            return self.driver.get_screenshot_as_png()
+
     def fill_comprobante_data(self, comprobante_data: dict) -> dict:
         """
         Llena los datos del comprobante electrónico en el modal
@@ -783,9 +1113,9 @@ class DomoticaPage:
         Returns:
             dict: Diccionario con las claves:
                 - success (bool): True si se llenaron los datos correctamente
-                - screenshot (str): Imagen en base64 de la pantalla después de llenar los datos
+                - screenshot (bytes): Imagen JPEG (o PNG como respaldo) de la pantalla después de llenar los datos
         """
-        screenshot_base64 = ""
+        screenshot = b""
         try:
             logger.info("✅ Verificando modal de comprobante...")
             
@@ -801,7 +1131,7 @@ class DomoticaPage:
             if tipo_documento != 'DNI':
                 try:
                     # Buscar el dropdown de tipo documento en el modal y hacer clic
-                    tipo_doc_dropdown = WebDriverWait(self.driver, 5).until(
+                    tipo_doc_dropdown = self._short_wait.until(
                         EC.element_to_be_clickable((By.XPATH, "//div[contains(@class, 'v-dialog')]//div[contains(@class, 'v-select__slot')]"))
                     )
                     self.driver.execute_script("arguments[0].click();", tipo_doc_dropdown)
@@ -809,7 +1139,7 @@ class DomoticaPage:
                     
                     # Seleccionar el tipo de documento correcto
                     option_xpath = f"//div[contains(@class, 'v-list-item__title') and text()='{tipo_documento}']"
-                    option = WebDriverWait(self.driver, 5).until(
+                    option = self._short_wait.until(
                         EC.element_to_be_clickable((By.XPATH, option_xpath))
                     )
                     self.driver.execute_script("arguments[0].click();", option)
@@ -940,7 +1270,7 @@ class DomoticaPage:
                             value_to_texto = {'T': 'Nota', 'B': 'Boleta', 'F': 'Factura'}
                             texto_label = value_to_texto.get(tipo_comprobante, 'Nota')
                             
-                        radio_label = WebDriverWait(self.driver, 5).until(
+                        radio_label = self._short_wait.until(
                             EC.element_to_be_clickable((By.XPATH, f"//div[@role='radiogroup']//label[text()='{texto_label}']"))
                         )
                         self.driver.execute_script("arguments[0].click();", radio_label)
@@ -978,7 +1308,7 @@ class DomoticaPage:
             # 7. HACER CLIC EN GUARDAR (COMENTADO POR AHORA)
             # NOTA: Por ahora no queremos que guarde, solo llenar los datos para emular
             # try:
-            #     guardar_button = WebDriverWait(self.driver, 5).until(
+            #     guardar_button = self._short_wait.until(
             #         EC.element_to_be_clickable((By.XPATH, "//button[contains(@class, 'v-btn') and .//span[text()='Guardar']]"))
             #     )
             #     self.driver.execute_script("arguments[0].click();", guardar_button)
@@ -1047,20 +1377,18 @@ class DomoticaPage:
                 # Dar tiempo para que se procese el cierre
                 time.sleep(3)
                 
-                # Capturar pantalla y convertir a base64
-                screenshot_base64 = ""
+                # Capturar pantalla
                 try:
                     logger.info("📸 Capturando pantalla...")
                     # Redimensionar ventana para asegurar buena resolución
                     self.driver.set_window_size(1920, 1080)
                     time.sleep(0.5)
                     
-                    screenshot_png = self.driver.get_screenshot_as_png()
-                    screenshot_base64 = base64.b64encode(screenshot_png).decode('utf-8')
-                    logger.info(f"✅ Captura realizada exitosamente ({len(screenshot_base64)} caracteres en base64)")
+                    screenshot = self._capture_screenshot()
+                    logger.info(f"✅ Captura realizada exitosamente ({len(screenshot)} bytes)")
                 except Exception as screenshot_err:
                     logger.error(f"❌ Error al capturar pantalla: {screenshot_err}")
-                    screenshot_base64 = "" # Ensure it's assigned even on error
+                    screenshot = b"" # Ensure it's assigned even on error
 
                 # Verificar que el modal se cerró
                 modal_closed = False
@@ -1124,15 +1452,15 @@ class DomoticaPage:
             
             return {
                 "success": True,
-                "screenshot": screenshot_base64
+                "screenshot": screenshot
             }
             
         except TimeoutException as e:
             logger.error(f"❌ Timeout: Modal de comprobante no encontrado: {str(e)}")
-            return {"success": False, "screenshot": ""}
+            return {"success": False, "screenshot": b""}
         except Exception as e:
             logger.error(f"❌ Error llenando datos del comprobante: {str(e)}")
-            return {"success": False, "screenshot": ""}
+            return {"success": False, "screenshot": b""}
 
     @contextmanager
     def _open_mesas_modal(self) -> Iterator[None]:
@@ -1172,7 +1500,7 @@ class DomoticaPage:
         finally:
             if modal_open:
                 try:
-                    close_btn = WebDriverWait(self.driver, 5).until(
+                    close_btn = self._short_wait.until(
                         EC.element_to_be_clickable(
                             (
                                 By.XPATH,
@@ -1186,7 +1514,7 @@ class DomoticaPage:
                     logger.warning("No se pudo cerrar el modal de mesas: %s", close_err)
 
                 try:
-                    WebDriverWait(self.driver, self.timeout).until(
+                    self._wait.until(
                         EC.presence_of_element_located(
                             (By.XPATH, "//div[contains(@class, 'v-card--link')]")
                         )
@@ -1224,70 +1552,71 @@ class DomoticaPage:
             logger.debug("Obteniendo código fuente de la página")
             page_source = self.driver.page_source
 
-            # Parsear con BeautifulSoup
-            logger.debug("Parseando HTML con BeautifulSoup")
-            soup = BeautifulSoup(page_source, "html.parser")
+            # Parsear una sola vez con lxml y reutilizar el árbol en todas las consultas
+            logger.debug("Parseando HTML con lxml")
+            tree = lxml.html.fromstring(page_source)
 
             # Extracción de datos
             mesas: List[MesaDomotica] = []
             logger.debug("Buscando elementos de mesa en el DOM")
 
             # Buscar todas las tarjetas de mesas
-            card_elements = soup.find_all("div", class_="v-card--link")
-            logger.debug(f"Encontrados {len(card_elements)} tarjetas de mesa")
+            card_elements = _MESA_CARDS_XPATH(tree)
+            logger.debug("Encontrados %d tarjetas de mesa", len(card_elements))
 
             for idx, card_element in enumerate(card_elements):
                 try:
                     # Extraer datos específicos con trazabilidad
-                    logger.debug(f"Procesando mesa #{idx+1}")
+                    logger.debug("Procesando mesa #%d", idx + 1)
 
                     # Obtener el color de fondo (puede indicar el estado)
-                    bg_color = str(card_element.get("style", ""))
+                    bg_color = card_element.get("style", "")
 
                     # Obtener el texto dentro de la tarjeta
-                    card_text_div = card_element.find("div", class_="v-card__text")
-                    if not card_text_div:
+                    card_text_divs = _MESA_CARD_TEXT_XPATH(card_element)
+                    if not card_text_divs:
                         logger.warning(
                             f"No se encontró el div de texto en la mesa #{idx+1}"
                         )
                         continue
+                    card_text_div = card_text_divs[0]
 
                     # Extraer el número de mesa del h2
-                    numero_element = card_text_div.find("h2", class_="black--text")
+                    numero_elements = _MESA_NUMERO_XPATH(card_text_div)
                     numero: str = (
-                        numero_element.text.strip() if numero_element else "Desconocido"
+                        _node_text(numero_elements[0])
+                        if numero_elements
+                        else "Desconocido"
                     )
 
                     # Extraer el estado (puede estar en el párrafo o determinarse por el color)
-                    estado_element = card_text_div.find("p", class_="white--text")
+                    estado_elements = _MESA_ESTADO_XPATH(card_text_div)
                     estado_texto = (
-                        estado_element.text.strip()
-                        if estado_element and estado_element.text.strip()
+                        _node_text(estado_elements[0])
+                        if estado_elements
                         else ""
                     )
 
                     # Determinar estado basado en el color si no hay texto explícito
                     if not estado_texto:
-                        if "rgb(70, 255, 0)" in bg_color:  # Verde
-                            estado_texto = "Disponible"
-                        elif "rgb(255, 45, 0)" in bg_color:  # Rojo
-                            estado_texto = "Ocupada"
-                        elif "rgb(255, 241, 0)" in bg_color:  # Amarillo
-                            estado_texto = "Reservada"
-                        else:
-                            estado_texto = "Estado desconocido"
+                        color_match = _ESTADO_COLOR_RE.search(bg_color)
+                        estado_texto = (
+                            _ESTADO_POR_COLOR[color_match.group(1)]
+                            if color_match
+                            else "Estado desconocido"
+                        )
 
                     lookup_key = numero.strip().lower()
                     metadata = mesas_metadata.get(lookup_key)
                     mesas.append(
-                        MesaDomotica(
+                        MesaDomotica.model_construct(
                             nombre=metadata.nombre if metadata else numero,
                             zona=metadata.zona if metadata else "Desconocida",
                             nota=metadata.nota if metadata else None,
                             estado=MesaEstadoEnum.from_str(estado_texto),
                         )
                     )
-                    logger.debug(f"Mesa extraída: {numero} - Estado: {estado_texto}")
+                    logger.debug("Mesa extraída: %s - Estado: %s", numero, estado_texto)
 
                 except Exception as e:
                     logger.error(
@@ -1334,7 +1663,7 @@ class DomoticaPage:
             logger.info("Buscando una mesa libre automáticamente")
             try:
                 # Buscar una mesa con fondo verde (disponible)
-                mesa_libre = WebDriverWait(self.driver, self.timeout).until(
+                mesa_libre = self._wait.until(
                     EC.element_to_be_clickable(
                         (
                             By.XPATH,
@@ -1367,8 +1696,20 @@ class DomoticaPage:
             )
             return False
 
-    def scrap_mesas_metadata(self) -> Dict[str, MesaDomotica]:
-        """Obtiene un diccionario de metadatos de mesas indexado por nombre normalizado."""
+    def scrap_mesas_metadata(self, ttl: float = 60.0) -> Dict[str, MesaDomotica]:
+        """
+        Obtiene un diccionario de metadatos de mesas indexado por nombre normalizado.
+
+        La zona y la nota de las mesas casi nunca cambian, por lo que el resultado
+        se comparte entre instancias durante ``ttl`` segundos y se evita abrir el
+        modal "Gestionar Mesas" en cada extracción. Con ``ttl <= 0`` siempre se
+        vuelve a leer el modal.
+        """
+
+        cached = DomoticaPage._mesas_metadata_cache
+        if ttl > 0 and cached and time.monotonic() - cached[0] < ttl:
+            logger.debug("Usando metadatos de mesas en caché")
+            return cached[1]
 
         metadata: Dict[str, MesaDomotica] = {}
 
@@ -1391,7 +1732,7 @@ class DomoticaPage:
                 zona = columnas[1].text.strip() or "Desconocida"
                 nota = columnas[2].text.strip() or None
 
-                metadata[nombre.lower()] = MesaDomotica(
+                metadata[nombre.lower()] = MesaDomotica.model_construct(
                     nombre=nombre,
                     zona=zona,
                     nota=nota,
@@ -1399,6 +1740,8 @@ class DomoticaPage:
                 )
 
         logger.info("Extraídas %d mesas desde el modal", len(metadata))
+        if metadata:
+            DomoticaPage._mesas_metadata_cache = (time.monotonic(), metadata)
         return metadata
 
     def get_only_products(self) -> dict:
@@ -1444,15 +1787,20 @@ class DomoticaPage:
                 }
 
             # Extraer categorías y productos
-            # Obtener todos los cards de categoría (hoverable)
-            category_cards = WebDriverWait(self.driver, 10).until(
-                lambda d: d.find_elements(
-                    By.XPATH,
-                    '//div[contains(@class, "hoverable") and contains(@class, "v-card") and contains(@class, "v-card--link") and contains(@class, "v-sheet") and contains(@class, "theme--light")]',
-                )
+            # Marcar los cards de categoría (hoverable) con un índice estable en
+            # una sola llamada JS; devuelve la cantidad de cards marcados
+            stamp_script = """
+            const cards = document.querySelectorAll(
+                'div.hoverable.v-card.v-card--link.v-sheet.theme--light'
+            );
+            cards.forEach((card, i) => card.setAttribute('data-cat-idx', i));
+            return cards.length;
+            """
+            category_count = WebDriverWait(self.driver, 10).until(
+                lambda d: d.execute_script(stamp_script)
             )
 
-            if not category_cards:
+            if not category_count:
                 elapsed = time.time() - start_time
                 logger.warning("No se encontraron cards de categoría")
                 return {
@@ -1461,17 +1809,15 @@ class DomoticaPage:
                     "elapsed_seconds": elapsed,
                 }
 
-            logger.info(f"Encontradas {len(category_cards)} categorías")
+            logger.info(f"Encontradas {category_count} categorías")
 
-            for idx in range(len(category_cards)):
-                # Refrescar la lista de cards en cada iteración
-                category_cards = WebDriverWait(self.driver, 10).until(
-                    lambda d: d.find_elements(
-                        By.XPATH,
-                        '//div[contains(@class, "hoverable") and contains(@class, "v-card") and contains(@class, "v-card--link") and contains(@class, "v-sheet") and contains(@class, "theme--light")]',
-                    )
+            for idx in range(category_count):
+                # Tras volver atrás el DOM se re-renderiza: re-marcar los cards
+                if idx > 0:
+                    self._short_wait.until(lambda d: d.execute_script(stamp_script))
+                card = self.driver.find_element(
+                    By.CSS_SELECTOR, f'[data-cat-idx="{idx}"]'
                 )
-                card = category_cards[idx]
                 btn = card
 
                 try:
@@ -1482,7 +1828,7 @@ class DomoticaPage:
                         )
                     )
                     category_name = category_name_elem.text
-                    logger.debug(f"Procesando categoría: {category_name}")
+                    logger.debug("Procesando categoría: %s", category_name)
                 except Exception as cat_err:
                     category_name = f"category_error_{idx}: {cat_err}"
                     logger.warning(
@@ -1507,25 +1853,35 @@ class DomoticaPage:
                 # Extraer productos de la tabla
                 products = []
                 try:
-                    rows = WebDriverWait(self.driver, 10).until(
-                        lambda d: d.find_elements(
-                            By.XPATH,
-                            '//div[contains(@class, "v-data-table__wrapper")]/table/tbody/tr',
+                    # Traer la tabla completa en una sola llamada en lugar de
+                    # pedir cada celda por separado al navegador
+                    table_html = WebDriverWait(self.driver, 10).until(
+                        lambda d: d.execute_script(
+                            """
+                            const wrapper = document.querySelector('div.v-data-table__wrapper');
+                            return wrapper && wrapper.querySelector('tbody tr')
+                                ? wrapper.outerHTML
+                                : null;
+                            """
                         )
                     )
 
-                    for row in rows:
-                        cols = row.find_elements(By.XPATH, "./td")
+                    tree = lxml.html.fromstring(table_html)
+                    for row in _TABLE_ROWS_XPATH(tree):
+                        cols = row.findall("td")
                         if len(cols) == 3:
-                            name = cols[0].text
-                            stock = cols[1].text
-                            price = cols[2].text
                             products.append(
-                                {"name": name, "stock": stock, "price": price}
+                                {
+                                    "name": _node_text(cols[0]),
+                                    "stock": _node_text(cols[1]),
+                                    "price": _node_text(cols[2]),
+                                }
                             )
 
                     logger.debug(
-                        f"Extraídos {len(products)} productos de categoría {category_name}"
+                        "Extraídos %d productos de categoría %s",
+                        len(products),
+                        category_name,
                     )
 
                 except Exception as prod_err:
@@ -1605,22 +1961,30 @@ class DomoticaPage:
             # 3. Extraer productos
             category_result = self.get_only_products()
 
-            # 4. Convertir a objetos ProductoDomotica
+            # 4. Convertir a objetos ProductoDomotica (un solo try por categoría)
+            construct = ProductoDomotica.model_construct
             for category_item in category_result.get("category", []):
                 category_name = category_item.get("category", "Sin categoría")
-                products = category_item.get("products", [])
+                # Descartar filas mal formadas antes del bucle; dict.get con
+                # valores por defecto garantiza que ninguna fila válida falle
+                products = [
+                    p for p in category_item.get("products", []) if isinstance(p, dict)
+                ]
 
-                for prod_dict in products:
-                    try:
-                        producto = ProductoDomotica(
+                try:
+                    productos.extend(
+                        construct(
                             categoria=category_name,
                             nombre=prod_dict.get("name", ""),
                             stock=prod_dict.get("stock", "0"),
                             precio=prod_dict.get("price", "0.00"),
                         )
-                        productos.append(producto)
-                    except Exception as e:
-                        logger.error(f"Error convirtiendo producto: {e}")
+                        for prod_dict in products
+                    )
+                except Exception as e:
+                    logger.error(
+                        f"Error convirtiendo productos de categoría {category_name}: {e}"
+                    )
 
             # 5. Logout
             self.logout()
@@ -1715,26 +2079,32 @@ class DomoticaPage:
             # Ahora intentar hacer clic en el menú hamburguesa
             logger.debug("Buscando menú hamburguesa...")
             
-            # Método 1: Buscar por el ícono mdi-menu
-            try:
-                menu_btn = WebDriverWait(self.driver, 10).until(
-                    EC.element_to_be_clickable(
-                        (By.XPATH, '//i[contains(@class, "mdi-menu")]')
-                    )
-                )
-                menu_btn.click()
-                logger.debug("Menú hamburguesa clickeado (método 1)")
-            except TimeoutException:
-                # Método 2: Usar JavaScript para hacer clic
+            # Método 1: Clic directo con JavaScript, sin sondear si es "clickable"
+            menu_clicked = self.driver.execute_script(
+                """
+                const icon = document.querySelector('i.mdi-menu');
+                if (!icon) {
+                    return false;
+                }
+                (icon.closest('button') || icon).click();
+                return true;
+                """
+            )
+            if menu_clicked:
+                logger.debug("Menú hamburguesa clickeado con JavaScript (método 1)")
+            else:
+                # Método 2: Esperar a que el ícono sea clickeable
                 try:
-                    menu_btn = self.driver.find_element(
-                        By.XPATH, '//i[contains(@class, "mdi-menu")]'
+                    menu_btn = WebDriverWait(self.driver, 10).until(
+                        EC.element_to_be_clickable(
+                            (By.XPATH, '//i[contains(@class, "mdi-menu")]')
+                        )
                     )
-                    self.driver.execute_script("arguments[0].click();", menu_btn)
-                    logger.debug("Menú hamburguesa clickeado con JavaScript (método 2)")
-                except Exception as js_err:
+                    menu_btn.click()
+                    logger.debug("Menú hamburguesa clickeado (método 2)")
+                except TimeoutException:
                     # Método 3: Buscar por el span padre
-                    menu_btn = WebDriverWait(self.driver, 5).until(
+                    menu_btn = self._short_wait.until(
                         EC.element_to_be_clickable(
                             (By.XPATH, '//span[contains(@class, "v-btn__content")]/i[contains(@class, "mdi-menu")]/..')
                         )
@@ -1742,16 +2112,21 @@ class DomoticaPage:
                     menu_btn.click()
                     logger.debug("Menú hamburguesa clickeado (método 3)")
 
-            # Esperar a que aparezca el menú desplegable y hacer clic en "Cerrar Sesion"
-            logout_btn = WebDriverWait(self.driver, self.timeout).until(
-                EC.element_to_be_clickable(
-                    (
-                        By.XPATH,
-                        '//div[contains(@class, "v-list-item__title") and contains(text(), "Cerrar Sesion")]',
-                    )
+            # Hacer clic en "Cerrar Sesion" con JavaScript en cuanto aparezca el menú
+            self._wait.until(
+                lambda d: d.execute_script(
+                    """
+                    const item = [...document.querySelectorAll('.v-list-item__title')]
+                        .find(e => e.textContent.includes('Cerrar Sesion'));
+                    if (!item) {
+                        return false;
+                    }
+                    item.click();
+                    return true;
+                    """
                 )
             )
-            logout_btn.click()
+            self.logged_in = False
             logger.info("Logout exitoso")
             return "logout_success"
             
@@ -1760,6 +2135,47 @@ class DomoticaPage:
             logger.error(error_msg)
             return error_msg
 
+    def is_alive(self) -> bool:
+        """
+        Verifica si la sesión del navegador sigue respondiendo.
+
+        Returns
+        -------
+        bool
+            True si el driver responde, False si la sesión se perdió.
+        """
+        try:
+            return bool(self.driver.session_id) and self.driver.current_url is not None
+        except Exception as e:
+            logger.warning(f"Sesión del navegador no disponible: {str(e)}")
+            return False
+
+    def reset(self) -> bool:
+        """
+        Deja el navegador en la pantalla de inicio de sesión para reutilizarlo.
+
+        Borra cookies y almacenamiento del sitio y vuelve a cargar la URL base,
+        de modo que el siguiente uso parte de un estado limpio sin tener que
+        arrancar un navegador nuevo.
+
+        Returns
+        -------
+        bool
+            True si el navegador quedó listo para reutilizarse, False en caso contrario.
+        """
+        try:
+            self.driver.execute_script(
+                "window.localStorage.clear(); window.sessionStorage.clear();"
+            )
+            self.driver.delete_all_cookies()
+            self.driver.get(self.base_url)
+            self.logged_in = False
+            logger.debug("Navegador reiniciado para reutilización")
+            return True
+        except Exception as e:
+            logger.warning(f"No se pudo reiniciar el navegador: {str(e)}")
+            return False
+
     def close(self) -> None:
         """
         Cierra el navegador y libera los recursos.
@@ -5,14 +5,14 @@ Este módulo proporciona servicios de negocio para orquestar el scraping
 de datos desde la plataforma Domotica INC.
 """
 
+import base64
 import logging
+import threading
 import time
-from typing import List
-import io
-import sys
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 import asyncio
 import aio_pika
-import json
 
 from src.repository.domotica_page import DomoticaPage
 from src.model.schemas import ProductoDomotica, MesaDomotica, PlatoInsertRequest, PlatoInsertResponse
@@ -21,64 +21,337 @@ from src.core.config import get_settings
 # Configurar logging
 logger = logging.getLogger(__name__)
 settings = get_settings()
+_rabbitmq_url = f"amqp://{settings.rabbitmq_user}:{settings.rabbitmq_password}@{settings.rabbitmq_host}:{settings.rabbitmq_port}/{settings.rabbitmq_vhost}"
 
 
-async def publish_screenshot_to_rabbitmq(screenshot_base64: str):
+# Conexión y exchange de screenshots compartidos por todo el proceso
+_screenshot_connection: Optional[aio_pika.abc.AbstractRobustConnection] = None
+_screenshot_exchange: Optional[aio_pika.abc.AbstractExchange] = None
+_screenshot_connect_lock = asyncio.Lock()
+
+# Cola en memoria de screenshots pendientes y tarea que los publica en segundo plano
+_screenshot_queue: Optional["asyncio.Queue[bytes]"] = None
+_screenshot_worker: Optional[asyncio.Task] = None
+
+
+async def connect_screenshot_publisher() -> None:
     """
-    Publica el screenshot en base64 a una cola de RabbitMQ dedicada.
-    
-    Args:
-        screenshot_base64: Imagen en formato base64
+    Abre la conexión de RabbitMQ usada para publicar screenshots.
+
+    Declara una sola vez el exchange, la cola y su binding para que cada
+    publicación solo tenga que enviar el mensaje. Si ya hay una conexión
+    abierta no hace nada; la conexión robusta se reconecta sola si el broker
+    se reinicia.
     """
-    if not screenshot_base64:
-        logger.warning("No hay screenshot para publicar")
-        return
-        
+    async with _screenshot_connect_lock:
+        if _screenshot_exchange is None:
+            await _declare_screenshot_exchange()
+
+
+async def _declare_screenshot_exchange() -> None:
+    """Abre la conexión y declara exchange, cola y binding de screenshots."""
+    global _screenshot_connection, _screenshot_exchange
+
     try:
-        rabbitmq_url = f"amqp://{settings.rabbitmq_user}:{settings.rabbitmq_password}@{settings.rabbitmq_host}:{settings.rabbitmq_port}/{settings.rabbitmq_vhost}"
-        
-        # Conectar a RabbitMQ
-        connection = await aio_pika.connect_robust(rabbitmq_url)
+        connection = await aio_pika.connect_robust(_rabbitmq_url)
         channel = await connection.channel()
-        
+
         # Declarar Exchange para screenshots
         exchange = await channel.declare_exchange(
             settings.rabbitmq_screenshot_exchange,
             type="fanout",
             durable=True
         )
-        
+
         # Declarar Cola para screenshots
         queue = await channel.declare_queue(
             settings.rabbitmq_screenshot_queue,
             durable=True
         )
-        
+
         # Bind queue al exchange
         await queue.bind(exchange, routing_key="screenshot.#")
-        
-        # Crear mensaje con el screenshot
-        message_body = json.dumps({
-            "screenshot": screenshot_base64,
-            "timestamp": time.time()
-        })
-        
+
+        _screenshot_connection, _screenshot_exchange = connection, exchange
+        logger.info("📸 Publicador de screenshots conectado a RabbitMQ")
+
+    except Exception as e:
+        logger.error(f"❌ Error conectando el publicador de screenshots: {e}")
+
+
+async def start_screenshot_publisher() -> None:
+    """
+    Conecta el publicador de screenshots e inicia su worker en segundo plano.
+
+    Debe llamarse desde el event loop de la aplicación (lifespan).
+    """
+    global _screenshot_queue, _screenshot_worker
+
+    await connect_screenshot_publisher()
+    _screenshot_queue = asyncio.Queue(maxsize=100)
+    _screenshot_worker = asyncio.create_task(_screenshot_publish_loop(_screenshot_queue))
+
+
+async def _screenshot_publish_loop(queue: "asyncio.Queue[bytes]") -> None:
+    """Publica en RabbitMQ los screenshots encolados, uno a la vez."""
+    while True:
+        screenshot_bytes = await queue.get()
+        try:
+            await publish_screenshot_to_rabbitmq(screenshot_bytes)
+        finally:
+            queue.task_done()
+
+
+def enqueue_screenshot(screenshot_bytes: bytes) -> bool:
+    """
+    Encola un screenshot para que el worker lo publique sin bloquear al llamador.
+
+    Args:
+        screenshot_bytes: Imagen en formato JPEG o PNG
+
+    Returns:
+        bool: True si el screenshot quedó encolado, False si el worker no
+            está activo o la cola está llena
+    """
+    if _screenshot_queue is None or _screenshot_worker is None or _screenshot_worker.done():
+        logger.warning("El worker de screenshots no está activo")
+        return False
+
+    try:
+        _screenshot_queue.put_nowait(screenshot_bytes)
+        return True
+    except asyncio.QueueFull:
+        logger.warning("Cola de screenshots llena, se descarta el screenshot")
+        return False
+
+
+async def close_screenshot_publisher() -> None:
+    """Publica los screenshots pendientes y cierra la conexión de RabbitMQ."""
+    global _screenshot_connection, _screenshot_exchange, _screenshot_queue, _screenshot_worker
+
+    if _screenshot_worker is not None:
+        try:
+            # Dar un margen para vaciar la cola antes de apagar
+            await asyncio.wait_for(_screenshot_queue.join(), timeout=5)
+        except asyncio.TimeoutError:
+            logger.warning(f"Se descartan {_screenshot_queue.qsize()} screenshots pendientes")
+        _screenshot_worker.cancel()
+        _screenshot_queue, _screenshot_worker = None, None
+
+    if _screenshot_connection:
+        await _screenshot_connection.close()
+    _screenshot_connection, _screenshot_exchange = None, None
+
+
+def _screenshot_mime(screenshot_bytes: bytes) -> str:
+    """Tipo MIME del screenshot: JPEG por CDP o PNG en la captura de respaldo."""
+    return "image/png" if screenshot_bytes.startswith(b"\x89PNG") else "image/jpeg"
+
+
+async def publish_screenshot_to_rabbitmq(screenshot_bytes: bytes) -> bool:
+    """
+    Publica el screenshot a una cola de RabbitMQ dedicada.
+
+    La imagen se envía como cuerpo binario del mensaje (``content_type``
+    image/jpeg o image/png según su formato) y la marca de tiempo viaja en
+    los headers, sin codificar en base64 ni envolver en JSON.
+    
+    Args:
+        screenshot_bytes: Imagen en formato JPEG o PNG
+
+    Returns:
+        bool: True si el mensaje se publicó, False en caso contrario
+    """
+    if not screenshot_bytes:
+        logger.warning("No hay screenshot para publicar")
+        return False
+
+    if _screenshot_exchange is None:
+        # Inicialización perezosa si el broker no estaba disponible al arrancar
+        await connect_screenshot_publisher()
+        if _screenshot_exchange is None:
+            return False
+
+    try:
         # Publicar mensaje
-        await exchange.publish(
+        await _screenshot_exchange.publish(
             aio_pika.Message(
-                body=message_body.encode(),
+                body=screenshot_bytes,
+                content_type=_screenshot_mime(screenshot_bytes),
+                headers={"timestamp": time.time()},
                 delivery_mode=aio_pika.DeliveryMode.PERSISTENT
             ),
             routing_key="screenshot.comprobante"
         )
         
-        logger.info(f"📸 Screenshot publicado a RabbitMQ ({len(screenshot_base64)} caracteres)")
-        
-        # Cerrar conexión
-        await connection.close()
+        logger.info(f"📸 Screenshot publicado a RabbitMQ ({len(screenshot_bytes)} bytes)")
+        return True
         
     except Exception as e:
         logger.error(f"❌ Error publicando screenshot a RabbitMQ: {e}")
+        return False
+
+
+class _DriverPool:
+    """
+    Pool de instancias DomoticaPage reutilizables entre llamadas al servicio.
+
+    Arrancar Chrome es la parte más lenta de cada operación, por lo que los
+    navegadores headless se conservan abiertos y se reinician (cookies y
+    almacenamiento borrados) al devolverlos. Los navegadores visibles, usados
+    solo para depuración, se cierran al terminar.
+
+    Attributes
+    ----------
+    max_size : int
+        Número máximo de navegadores en uso al mismo tiempo
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max(1, max_size)
+        self._idle: List[DomoticaPage] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+
+    @contextmanager
+    def acquire(self, headless: Optional[bool] = None) -> Iterator[DomoticaPage]:
+        """
+        Obtiene un navegador del pool, creando uno nuevo si no hay disponibles.
+
+        Parameters
+        ----------
+        headless : bool, opcional
+            Modo del navegador. Si es None, se usa la configuración del debug.
+
+        Yields
+        ------
+        DomoticaPage
+            Instancia lista para iniciar sesión
+        """
+        use_headless = headless if headless is not None else (not settings.debug)
+        self._slots.acquire()
+        domotica: Optional[DomoticaPage] = None
+        try:
+            if use_headless:
+                with self._lock:
+                    domotica = self._idle.pop() if self._idle else None
+                if domotica is not None and not domotica.is_alive():
+                    logger.warning("Navegador del pool sin sesión, se creará uno nuevo")
+                    domotica.close()
+                    domotica = None
+
+            if domotica is None:
+                domotica = DomoticaPage(headless=use_headless)
+
+            yield domotica
+
+        finally:
+            if domotica is not None:
+                self._release(domotica, use_headless)
+            self._slots.release()
+
+    def _release(self, domotica: DomoticaPage, reusable: bool) -> None:
+        """Devuelve el navegador al pool o lo cierra si no se puede reutilizar."""
+        if reusable and domotica.reset():
+            with self._lock:
+                self._idle.append(domotica)
+            return
+        domotica.close()
+
+    def close_all(self) -> None:
+        """Cierra todos los navegadores inactivos del pool."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for domotica in idle:
+            domotica.close()
+
+
+# Pool compartido de navegadores para todo el proceso
+_pool = _DriverPool(settings.domotica_pool_size)
+
+
+def close_driver_pool() -> None:
+    """Cierra los navegadores del pool al apagar la aplicación."""
+    _pool.close_all()
+
+
+# Caché en memoria de los catálogos ya parseados: clave -> (expiración, resultado)
+_scrape_cache: Dict[str, Tuple[float, List[Any]]] = {}
+# Un lock por catálogo: productos y mesas pueden scrapearse a la vez
+_scrape_key_locks: Dict[str, threading.Lock] = {}
+_scrape_key_locks_guard = threading.Lock()
+
+
+def _scrape_lock(key: str) -> threading.Lock:
+    """Obtiene (creándolo si hace falta) el lock del catálogo indicado."""
+    with _scrape_key_locks_guard:
+        return _scrape_key_locks.setdefault(key, threading.Lock())
+
+
+def _cached_scrape(key: str, loader: Callable[[], List[Any]]) -> List[Any]:
+    """
+    Devuelve el resultado cacheado de un scraping o lo ejecuta si expiró.
+
+    El scraping se ejecuta bajo un lock por catálogo con doble comprobación para
+    que varias peticiones simultáneas con la caché vacía solo abran una sesión
+    del navegador, sin bloquear el scraping de otros catálogos.
+    Los resultados vacíos no se cachean, ya que suelen indicar un fallo.
+
+    Parameters
+    ----------
+    key : str
+        Clave del catálogo en la caché
+    loader : Callable[[], List[Any]]
+        Función que realiza el scraping
+
+    Returns
+    -------
+    List[Any]
+        Lista de modelos ya parseados
+    """
+    ttl = settings.domotica_scrape_cache_ttl
+    if ttl <= 0:
+        return loader()
+
+    entry = _scrape_cache.get(key)
+    if entry and entry[0] > time.monotonic():
+        logger.info(f"Servicio: Usando '{key}' desde caché")
+        return entry[1]
+
+    with _scrape_lock(key):
+        entry = _scrape_cache.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
+        result = loader()
+        if result:
+            _scrape_cache[key] = (time.monotonic() + ttl, result)
+        return result
+
+
+# Límite de scrapings ejecutándose a la vez en hilos del event loop
+_scrape_semaphore = asyncio.Semaphore(max(1, settings.domotica_max_concurrent_scrapes))
+
+
+async def _run_scrape(key: str, loader: Callable[[], List[Any]]) -> List[Any]:
+    """Ejecuta un scraping cacheado en un hilo, respetando el límite de concurrencia."""
+    async with _scrape_semaphore:
+        return await asyncio.to_thread(_cached_scrape, key, loader)
+
+
+def invalidate_scrape_cache(key: Optional[str] = None) -> None:
+    """
+    Descarta los catálogos cacheados para forzar un nuevo scraping.
+
+    Parameters
+    ----------
+    key : Optional[str]
+        Catálogo a descartar ("productos" o "mesas"); si es None se descartan todos
+    """
+    if key is None:
+        _scrape_cache.clear()
+    else:
+        _scrape_cache.pop(key, None)
 
 
 class LogCapture:
@@ -93,6 +366,10 @@ class LogCapture:
         self.logs.append(message)
         logger.info(message)
         
+    def add_log_silent(self, message: str):
+        """Agregar un log informativo solo a la respuesta, sin emitirlo al logger"""
+        self.logs.append(message)
+        
     def add_warning(self, message: str):
         """Agregar un warning (también se considera log)"""
         self.logs.append(f"WARNING: {message}")
@@ -105,22 +382,29 @@ class LogCapture:
         logger.error(message)
 
 
-def scrape_and_get_productos() -> List[ProductoDomotica]:
+async def scrape_and_get_productos() -> List[ProductoDomotica]:
     """
     Obtiene productos mediante scraping.
 
-    Este servicio crea una instancia del repository DomoticaPage,
-    ejecuta el scraping completo de productos y cierra el driver.
+    Este servicio toma una instancia del repository DomoticaPage del pool,
+    ejecuta el scraping completo de productos y la devuelve al pool. El
+    resultado se reutiliza durante ``domotica_scrape_cache_ttl`` segundos.
+    El scraping bloqueante se ejecuta en un hilo aparte.
 
     Returns
     -------
     List[ProductoDomotica]
         Lista de productos extraídos
     """
+    return await _run_scrape("productos", _scrape_productos)
+
+
+def _scrape_productos() -> List[ProductoDomotica]:
+    """Realiza el scraping de productos sin pasar por la caché."""
     logger.info("Servicio: Iniciando obtención de productos")
 
     try:
-        with DomoticaPage() as domotica:
+        with _pool.acquire() as domotica:
             domotica.login()
             platos = domotica.scrap_productos()
             return platos
@@ -130,23 +414,30 @@ def scrape_and_get_productos() -> List[ProductoDomotica]:
         return []
 
 
-def scrape_and_get_mesas() -> List[MesaDomotica]:
+async def scrape_and_get_mesas() -> List[MesaDomotica]:
     """
     Obtiene mesas mediante scraping.
 
-    Este servicio crea una instancia del repository DomoticaPage,
-    ejecuta el scraping completo de mesas y cierra el driver.
+    Este servicio toma una instancia del repository DomoticaPage del pool,
+    ejecuta el scraping completo de mesas y la devuelve al pool. El
+    resultado se reutiliza durante ``domotica_scrape_cache_ttl`` segundos.
+    El scraping bloqueante se ejecuta en un hilo aparte.
 
     Returns
     -------
     List[MesaDomotica]
         Lista de mesas extraídas
     """
+    return await _run_scrape("mesas", _scrape_mesas)
+
+
+def _scrape_mesas() -> List[MesaDomotica]:
+    """Realiza el scraping de mesas sin pasar por la caché."""
     logger.info("Servicio: Iniciando obtención de mesas")
 
     try:
-        # Inicializar DomoticaPage y extraer mesas
-        with DomoticaPage() as domotica:
+        # Obtener DomoticaPage del pool y extraer mesas
+        with _pool.acquire() as domotica:
             domotica.login()
             mesas = domotica.scrap_mesas()
             logger.info(f"Se extrajeron {len(mesas)} mesas para sincronización")
@@ -157,7 +448,26 @@ def scrape_and_get_mesas() -> List[MesaDomotica]:
         return []
 
 
-def insertar_plato(plato_data: PlatoInsertRequest, headless: bool = True) -> PlatoInsertResponse:
+async def scrape_all() -> Tuple[List[ProductoDomotica], List[MesaDomotica]]:
+    """
+    Obtiene productos y mesas en paralelo.
+
+    Cada scraping toma su propio navegador del pool, por lo que el tiempo
+    total es el del más lento en lugar de la suma de ambos.
+
+    Returns
+    -------
+    Tuple[List[ProductoDomotica], List[MesaDomotica]]
+        Productos y mesas extraídos
+    """
+    productos, mesas = await asyncio.gather(
+        scrape_and_get_productos(),
+        scrape_and_get_mesas(),
+    )
+    return productos, mesas
+
+
+async def insertar_plato(plato_data: PlatoInsertRequest, headless: bool = True) -> PlatoInsertResponse:
     """
     Inserta platos en una mesa del sistema Domotica.
     
@@ -168,7 +478,12 @@ def insertar_plato(plato_data: PlatoInsertRequest, headless: bool = True) -> Pla
     4. Inserta los platos en la mesa
     5. Llena el comprobante electrónico
     6. Hace logout
-    7. Devuelve logs completos y errores acumulados
+    7. Encola el screenshot del comprobante para publicarlo en RabbitMQ
+    8. Devuelve logs completos y errores acumulados
+
+    La parte de Selenium es bloqueante y se ejecuta en un hilo aparte para
+    no detener el event loop; el screenshot lo publica un worker en segundo
+    plano usando la conexión compartida.
     
     Args:
         plato_data: Datos de la mesa y platos a insertar
@@ -178,19 +493,57 @@ def insertar_plato(plato_data: PlatoInsertRequest, headless: bool = True) -> Pla
     Returns:
         PlatoInsertResponse: Resultado de la operación con logs y errores
     """
+    result, screenshot_bytes = await asyncio.to_thread(_insertar_plato_sync, plato_data, headless)
+
+    # Encolar el screenshot para publicarlo en RabbitMQ sin retrasar la respuesta
+    if screenshot_bytes:
+        if enqueue_screenshot(screenshot_bytes):
+            result.logs.append("Screenshot encolado para RabbitMQ")
+        elif await publish_screenshot_to_rabbitmq(screenshot_bytes):
+            result.logs.append("Screenshot enviado a cola de RabbitMQ")
+        else:
+            result.logs.append("WARNING: Error al publicar screenshot")
+
+    # La respuesta HTTP mantiene el screenshot en base64
+    result.screenshot = base64.b64encode(screenshot_bytes).decode("ascii")
+    if screenshot_bytes:
+        result.screenshot_mime = _screenshot_mime(screenshot_bytes)
+    return result
+
+
+def _insertar_plato_sync(
+    plato_data: PlatoInsertRequest, headless: bool
+) -> Tuple[PlatoInsertResponse, bytes]:
+    """
+    Ejecuta con Selenium el flujo de inserción de ``insertar_plato``.
+
+    Devuelve la respuesta sin screenshot junto con la imagen capturada
+    (vacía si no se pudo llenar el comprobante).
+    """
     mesa_nombre = plato_data.mesa.nombre
     num_platos = len(plato_data.platos)
+
+    # Datos del comprobante preparados antes de abrir el navegador
+    comprobante = plato_data.comprobante
+    comprobante_data = {
+        'tipo_documento': comprobante.tipo_documento.value,
+        'numero_documento': comprobante.numero_documento,
+        'nombres_completos': comprobante.nombres_completos,
+        'direccion': comprobante.direccion,
+        'observacion': comprobante.observacion,
+        'tipo_comprobante': comprobante.tipo_comprobante.value
+    }
     
     # Crear capturador de logs
     log_capture = LogCapture()
     log_capture.add_log(f"Iniciando inserción de {num_platos} platos en mesa '{mesa_nombre}' (headless: {headless})")
     
     # Inicializar variable de screenshot
-    screenshot_base64 = ""
+    screenshot_bytes = b""
     
     try:
-        # Crear instancia de DomoticaPage con el modo headless especificado
-        with DomoticaPage(headless=headless) as domotica:
+        # Obtener un navegador del pool con el modo headless especificado
+        with _pool.acquire(headless=headless) as domotica:
             # Hacer login
             log_capture.add_log("Iniciando proceso de login...")
             login_success = domotica.login()
@@ -202,8 +555,7 @@ def insertar_plato(plato_data: PlatoInsertRequest, headless: bool = True) -> Pla
                     message="Error al hacer login en Domotica",
                     logs=log_capture.logs,
                     errors=log_capture.errors,
-                    screenshot=screenshot_base64
-                )
+                ), screenshot_bytes
             
             log_capture.add_log("Login exitoso, navegando a sección de Mesas...")
             mesas_success = domotica.navigate_to_mesas()
@@ -215,8 +567,7 @@ def insertar_plato(plato_data: PlatoInsertRequest, headless: bool = True) -> Pla
                     message="Error al navegar a la sección de Mesas",
                     logs=log_capture.logs,
                     errors=log_capture.errors,
-                    screenshot=screenshot_base64
-                )
+                ), screenshot_bytes
             
             log_capture.add_log(f"Seleccionando mesa '{mesa_nombre}'...")
             mesa_select_success = domotica.select_mesa(mesa_nombre)
@@ -228,89 +579,86 @@ def insertar_plato(plato_data: PlatoInsertRequest, headless: bool = True) -> Pla
                     message=f"Error al seleccionar la mesa '{mesa_nombre}'",
                     logs=log_capture.logs,
                     errors=log_capture.errors,
-                    screenshot=screenshot_base64
-                )
+                ), screenshot_bytes
             
             log_capture.add_log(f"Mesa '{mesa_nombre}' seleccionada. Iniciando inserción de {num_platos} platos...")
-            # Insertar cada plato en el campo de búsqueda
+            # Insertar todos los platos en un único lote dentro del navegador
+            items = [
+                {
+                    "nombre": plato.nombre,
+                    "cantidad": plato.stock or "1",
+                    "comentario": plato.comentario or "",
+                }
+                for plato in plato_data.platos
+            ]
+            resultados = domotica.insert_products_batch(items)
+
             platos_insertados = 0
-            for plato in plato_data.platos:
-                try:
-                    # Insertar el producto en el campo de búsqueda con su cantidad (stock) y comentario
-                    cantidad_str = str(plato.stock) if hasattr(plato, 'stock') and plato.stock else "1"
-                    comentario_str = plato.comentario if hasattr(plato, 'comentario') and plato.comentario else ""
-                    insert_success = domotica.insert_product_in_search(plato.nombre, cantidad_str, comentario_str)
-                    
-                    if insert_success:
-                        platos_insertados += 1
-                        log_msg = f"Plato '{plato.nombre}' insertado exitosamente con cantidad {cantidad_str}"
-                        if comentario_str:
-                            log_msg += f" y comentario '{comentario_str}'"
-                        log_msg += f" ({platos_insertados}/{num_platos})"
-                        log_capture.add_log(log_msg)
-                    else:
-                        log_capture.add_warning(f"Error al insertar plato '{plato.nombre}'")
-                        
-                except Exception as e:
-                    log_capture.add_warning(f"Excepción al insertar plato '{plato.nombre}': {str(e)}")
-                
-                # Pausa entre inserción de platos para estabilidad
-                if platos_insertados < num_platos:
-                    time.sleep(0.5)
+            platos_desconocidos = 0
+            # El detalle de cada plato va a la respuesta; al logger solo el progreso
+            progress_step = max(1, num_platos // 10)
+            for index, (item, resultado) in enumerate(zip(items, resultados), start=1):
+                if resultado.get("ok"):
+                    platos_insertados += 1
+                    log_msg = f"Plato '{item['nombre']}' insertado exitosamente con cantidad {item['cantidad']}"
+                    if item["comentario"]:
+                        log_msg += f" y comentario '{item['comentario']}'"
+                    log_msg += f" ({platos_insertados}/{num_platos})"
+                    log_capture.add_log_silent(log_msg)
+                elif resultado.get("ok") is None:
+                    platos_desconocidos += 1
+                    log_capture.add_warning(
+                        f"Estado desconocido del plato '{item['nombre']}', revisar la mesa: {resultado.get('error')}"
+                    )
+                else:
+                    log_capture.add_warning(
+                        f"Error al insertar plato '{item['nombre']}': {resultado.get('error')}"
+                    )
+                if index % progress_step == 0:
+                    logger.info(f"Progreso: {index}/{num_platos} platos procesados")
             
             log_capture.add_log(f"Proceso de inserción de platos completado: {platos_insertados}/{num_platos} insertados")
-            
-            try:
-                log_capture.add_log("Abriendo modal de comprobante electrónico...")
-                comprobante_button_success = domotica.open_comprobante_modal()
+            if not platos_insertados:
+                if platos_desconocidos:
+                    # El plato pudo quedar en la mesa aunque no se confirmara
+                    invalidate_scrape_cache("mesas")
+                # Sin platos confirmados en la mesa no hay nada que facturar
+                log_capture.add_warning("No se insertó ningún plato, se omite el comprobante electrónico")
+                comprobante_success = False
+            else:
+                # El estado de la mesa cambió, la lista cacheada ya no es válida
+                invalidate_scrape_cache("mesas")
+
+                try:
+                    log_capture.add_log("Abriendo modal de comprobante electrónico...")
+                    comprobante_button_success = domotica.open_comprobante_modal()
                 
-                if not comprobante_button_success:
-                    log_capture.add_warning("No se pudo abrir el modal de comprobante")
-                    comprobante_success = False
-                else:
-                    log_capture.add_log("Modal de comprobante abierto, llenando datos...")
-                    
-                    # Solo intentar llenar el comprobante si el modal se abrió
-                    comprobante_data = {
-                        'tipo_documento': plato_data.comprobante.tipo_documento.value,
-                        'numero_documento': plato_data.comprobante.numero_documento,
-                        'nombres_completos': plato_data.comprobante.nombres_completos,
-                        'direccion': plato_data.comprobante.direccion,
-                        'observacion': plato_data.comprobante.observacion,
-                        'tipo_comprobante': plato_data.comprobante.tipo_comprobante.value
-                    }
+                    if not comprobante_button_success:
+                        log_capture.add_warning("No se pudo abrir el modal de comprobante")
+                        comprobante_success = False
+                    else:
+                        log_capture.add_log("Modal de comprobante abierto, llenando datos...")
                     
-                    comprobante_result = domotica.fill_comprobante_data(comprobante_data)
-                    comprobante_success = comprobante_result["success"]
+                        # Solo intentar llenar el comprobante si el modal se abrió
+                        comprobante_result = domotica.fill_comprobante_data(comprobante_data)
+                        comprobante_success = comprobante_result["success"]
                     
-                    if comprobante_success:
-                        log_capture.add_log("Datos del comprobante llenados exitosamente")
-                        # Guardar screenshot si está disponible
-                        screenshot_base64 = comprobante_result.get("screenshot", "")
+                        if comprobante_success:
+                            log_capture.add_log("Datos del comprobante llenados exitosamente")
+                            # Guardar screenshot si está disponible
+                            screenshot_bytes = comprobante_result.get("screenshot", b"")
+                        else:
+                            log_capture.add_warning("No se pudieron llenar los datos del comprobante")
+                            screenshot_bytes = b""
                         
-                        # Publicar screenshot a RabbitMQ
-                        if screenshot_base64:
-                            try:
-                                # Ejecutar la publicación asíncrona desde contexto síncrono
-                                loop = asyncio.new_event_loop()
-                                asyncio.set_event_loop(loop)
-                                loop.run_until_complete(publish_screenshot_to_rabbitmq(screenshot_base64))
-                                loop.close()
-                                log_capture.add_log("Screenshot enviado a cola de RabbitMQ")
-                            except Exception as pub_err:
-                                log_capture.add_warning(f"Error al publicar screenshot: {pub_err}")
-                    else:
-                        log_capture.add_warning("No se pudieron llenar los datos del comprobante")
-                        screenshot_base64 = ""
-                        
-            except AttributeError as attr_ex:
-                log_capture.add_warning(f"Error de atributo en comprobante: {str(attr_ex)}")
-                comprobante_success = False
-            except Exception as comp_ex:
-                log_capture.add_warning(f"Excepción general al manejar comprobante: {str(comp_ex)}")
-                comprobante_success = False
+                except AttributeError as attr_ex:
+                    log_capture.add_warning(f"Error de atributo en comprobante: {str(attr_ex)}")
+                    comprobante_success = False
+                except Exception as comp_ex:
+                    log_capture.add_warning(f"Excepción general al manejar comprobante: {str(comp_ex)}")
+                    comprobante_success = False
             
-            time.sleep(0.5)
+            domotica.wait_for_search_ready()
             
             log_capture.add_log("Iniciando proceso de logout...")
             try:
@@ -323,34 +671,32 @@ def insertar_plato(plato_data: PlatoInsertRequest, headless: bool = True) -> Pla
             except Exception as logout_ex:
                 log_capture.add_warning(f"Excepción durante el logout: {str(logout_ex)}")
                 logout_result = "logout_exception"
-            
-            # Determinar el mensaje final y si hubo errores
-            comprobante_msg = "Comprobante llenado exitosamente" if comprobante_success else "Error al llenar comprobante"
-            logout_msg = "Logout exitoso" if logout_result == "logout_success" else "Error en logout"
-            
-            log_capture.add_log(f"Proceso completado - {platos_insertados}/{num_platos} platos insertados")
-            
-            # Si hay errores, retornar como fallo
-            if log_capture.errors:
-                return PlatoInsertResponse(
-                    success=False,
-                    message=f"Proceso completado con errores - {platos_insertados}/{num_platos} platos insertados en mesa '{mesa_nombre}' - {comprobante_msg} - {logout_msg}",
-                    mesa_nombre=mesa_nombre,
-                    platos_insertados=platos_insertados,
-                    logs=log_capture.logs,
-                    errors=log_capture.errors,
-                    screenshot=screenshot_base64
-                )
-            
+
+        # El navegador ya volvió al pool: la respuesta se arma fuera del bloque with
+        comprobante_msg = "Comprobante llenado exitosamente" if comprobante_success else "Error al llenar comprobante"
+        logout_msg = "Logout exitoso" if logout_result == "logout_success" else "Error en logout"
+        
+        log_capture.add_log(f"Proceso completado - {platos_insertados}/{num_platos} platos insertados")
+        
+        # Si hay errores, retornar como fallo
+        if log_capture.errors:
             return PlatoInsertResponse(
-                success=True,
-                message=f"Proceso completado exitosamente - {platos_insertados}/{num_platos} platos insertados en mesa '{mesa_nombre}' - {comprobante_msg} - {logout_msg}",
+                success=False,
+                message=f"Proceso completado con errores - {platos_insertados}/{num_platos} platos insertados en mesa '{mesa_nombre}' - {comprobante_msg} - {logout_msg}",
                 mesa_nombre=mesa_nombre,
                 platos_insertados=platos_insertados,
                 logs=log_capture.logs,
                 errors=log_capture.errors,
-                screenshot=screenshot_base64
-            )
+            ), screenshot_bytes
+        
+        return PlatoInsertResponse(
+            success=True,
+            message=f"Proceso completado exitosamente - {platos_insertados}/{num_platos} platos insertados en mesa '{mesa_nombre}' - {comprobante_msg} - {logout_msg}",
+            mesa_nombre=mesa_nombre,
+            platos_insertados=platos_insertados,
+            logs=log_capture.logs,
+            errors=log_capture.errors,
+        ), screenshot_bytes
             
     except Exception as e:
         error_msg = f"Error crítico durante la inserción: {str(e)}"
@@ -360,5 +706,4 @@ def insertar_plato(plato_data: PlatoInsertRequest, headless: bool = True) -> Pla
             message=error_msg,
             logs=[f"Iniciando inserción de {num_platos} platos en mesa '{mesa_nombre}'", f"ERROR: {error_msg}"],
             errors=[error_msg],
-            screenshot=""
-        )
+        ), b""
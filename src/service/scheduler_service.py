@@ -5,20 +5,49 @@ Este módulo proporciona funcionalidades para ejecutar tareas programadas
 como sincronización de datos con APIs externas.
 """
 
+import gzip
 import logging
+import orjson
 import requests
-import schedule
-import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import threading
-from typing import Dict, Any, List, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 
 from src.repository.domotica_page import DomoticaPage
 from src.core.config import get_settings
-from src.model.schemas import ProductoDomotica
+from src.model.schemas import MesaDomotica, ProductoDomotica
 
 # Configurar logging para este módulo
 logger = logging.getLogger(__name__)
 
+# Segundos que se reutiliza el mismo navegador entre sincronizaciones
+_PAGE_TTL_SECONDS = 1800
+
+# Con api_sync_gzip activo, los payloads mayores a este tamaño (bytes) se envían comprimidos
+_GZIP_MIN_BYTES = 4096
+
+# Respuestas de una API que no descomprime el cuerpo (Starlette/FastAPI responden 400/422)
+_GZIP_REJECTED_STATUS = frozenset({400, 415, 422})
+
+# Campos de ProductoDomotica, resueltos una sola vez al importar
+_PRODUCT_FIELDS = tuple(ProductoDomotica.model_fields)
+
+
+def _fast_dump(producto: ProductoDomotica) -> Dict[str, Any]:
+    """
+    Convierte un producto a diccionario leyendo directamente sus atributos.
+
+    Produce el mismo resultado que ``model_dump()`` para este modelo plano
+    (solo campos str/None), sin pasar por el serializador de pydantic.
+    """
+    values = producto.__dict__
+    return {field: values[field] for field in _PRODUCT_FIELDS}
+
 
 class SchedulerService:
     """
@@ -36,7 +65,113 @@ class SchedulerService:
         self.sync_platos_url = f"{self.settings.api_base_url}/api/v1/sync/platos"
         self.sync_mesas_url = f"{self.settings.api_base_url}/api/v1/sync/mesas"
         self.scheduler_thread = None
-        self.is_running = False
+        self._stop_event = threading.Event()
+        self._gzip_enabled = self.settings.api_sync_gzip
+        self._fire_time: Optional[Tuple[int, int]] = None  # (hora, minuto) de la sincronización diaria
+
+        # Navegador reutilizado entre sincronizaciones cercanas (un uso a la vez)
+        self._domotica: Optional[DomoticaPage] = None
+        self._domotica_expiry = 0.0
+        self._domotica_lock = threading.Lock()
+
+        # Sesión HTTP reutilizable: mantiene la conexión (y TLS) abierta entre
+        # sincronizaciones y reintenta errores transitorios del servidor
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=8,
+            max_retries=Retry(
+                total=3,
+                read=0,  # No repetir POST tras un read timeout: la API pudo procesarlo
+                backoff_factor=0.5,
+                status_forcelist=[502, 503, 504],
+                allowed_methods=frozenset({"HEAD", "GET", "POST"}),
+            ),
+        )
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._session.headers.update({"Content-Type": "application/json"})
+
+    @property
+    def is_running(self) -> bool:
+        """
+        Indica si el hilo del programador está activo.
+        """
+        return (
+            self.scheduler_thread is not None
+            and self.scheduler_thread.is_alive()
+            and not self._stop_event.is_set()
+        )
+
+    @contextmanager
+    def _page(self) -> Iterator[DomoticaPage]:
+        """
+        Entrega el navegador cacheado, creando uno nuevo si expiró o se perdió.
+
+        El navegador (y su sesión iniciada, si sigue activa) se reutiliza
+        durante ``_PAGE_TTL_SECONDS``; login() no repite el inicio de sesión
+        mientras la página siga autenticada. Si la sincronización falla con una
+        excepción el navegador se descarta, ya que su estado es incierto; si
+        expiró durante el uso se cierra al liberarlo.
+
+        Yields:
+            DomoticaPage: Instancia de uso exclusivo mientras dure el bloque.
+        """
+        with self._domotica_lock:
+            if self._domotica is not None and (
+                time.monotonic() > self._domotica_expiry or not self._domotica.is_alive()
+            ):
+                self._discard_page()
+
+            if self._domotica is None:
+                self._domotica = DomoticaPage()
+                self._domotica_expiry = time.monotonic() + _PAGE_TTL_SECONDS
+
+            try:
+                yield self._domotica
+            except Exception:
+                self._discard_page()
+                raise
+
+            # Si expiró mientras estaba en uso, cerrarlo al liberarlo
+            if time.monotonic() > self._domotica_expiry:
+                self._discard_page()
+
+    def _expire_page(self) -> None:
+        """
+        Marca el navegador cacheado para descartarlo al liberarlo.
+
+        Se usa cuando una página reutilizada no extrae nada: lo más probable es
+        que la sesión del servidor haya expirado aunque ``logged_in`` siga en True.
+        """
+        self._domotica_expiry = 0.0
+
+    def _discard_page(self) -> None:
+        """
+        Cierra el navegador cacheado (requiere tener ``_domotica_lock``).
+        """
+        if self._domotica is not None:
+            self._domotica.close()
+            self._domotica = None
+
+    def _close_page(self) -> None:
+        """
+        Cierra el navegador cacheado, esperando si hay una sincronización en curso.
+        """
+        with self._domotica_lock:
+            self._discard_page()
+
+    def _close_expired_page(self) -> None:
+        """
+        Cierra el navegador cacheado si ya expiró y no está en uso.
+        """
+        if self._domotica is None or time.monotonic() <= self._domotica_expiry:
+            return
+        if self._domotica_lock.acquire(blocking=False):
+            try:
+                self._discard_page()
+            finally:
+                self._domotica_lock.release()
 
     def sync_mesas(self) -> bool:
         """
@@ -52,43 +187,31 @@ class SchedulerService:
 
         try:
             # Inicializar DomoticaPage y extraer mesas
-            with DomoticaPage() as domotica:
+            with self._page() as domotica:
                 if not domotica.login():
                     logger.error("No se pudo iniciar sesión en Domotica Peru")
+                    # No reutilizar un navegador en estado desconocido
+                    self._discard_page()
                     return False
 
                 mesas = domotica.scrap_mesas()
 
                 if not mesas:
                     logger.warning("No se encontraron mesas para sincronizar")
+                    self._expire_page()
                     return False
 
-                logger.info(f"Se extrajeron {len(mesas)} mesas para sincronización")
+                logger.info("Se extrajeron %d mesas para sincronización", len(mesas))
 
                 # Enviar datos al endpoint de sincronización
-                headers = {
-                    "Content-Type": "application/json",
-                }
-
-                response = requests.post(
-                    self.sync_mesas_url,
-                    json=[m.model_dump() for m in mesas],
-                    headers=headers,
-                    timeout=180,
-                )
-
-                if response.status_code == 200:
-                    result = response.json()
-                    logger.info(f"Sincronización exitosa. Respuesta: {result}")
-                    return True
-                else:
-                    logger.error(
-                        f"Error en sincronización: {response.status_code} - {response.text}"
-                    )
-                    return False
+                return self._send_mesas(mesas)
 
-        except Exception as e:
-            logger.error(f"Error durante la sincronización de mesas: {str(e)}")
+        except requests.exceptions.RequestException:
+            # Los errores transitorios ya se reintentaron en el adaptador de la sesión
+            logger.exception("Error HTTP durante la sincronización de mesas")
+            return False
+        except Exception:
+            logger.exception("Error inesperado durante la sincronización de mesas")
             return False
 
     def sync_platos(self) -> bool:
@@ -105,9 +228,11 @@ class SchedulerService:
 
         try:
             # Inicializar DomoticaPage y extraer platos
-            with DomoticaPage() as domotica:
+            with self._page() as domotica:
                 if not domotica.login():
                     logger.error("No se pudo iniciar sesión en Domotica Peru")
+                    # No reutilizar un navegador en estado desconocido
+                    self._discard_page()
                     return False
 
                 # Extraer platos
@@ -115,45 +240,163 @@ class SchedulerService:
 
                 if not platos:
                     logger.warning("No se encontraron platos para sincronizar")
+                    self._expire_page()
                     return False
 
-                logger.info(f"Se extrajeron {len(platos)} platos para sincronización")
+                logger.info("Se extrajeron %d platos para sincronización", len(platos))
 
                 # Enviar datos al endpoint de sincronización
-                headers = {
-                    "Content-Type": "application/json",
-                }
-
-                # Usar model_dump() en lugar de model_dump_json() para obtener diccionarios Python
-                platos_data: List[Dict[str, str]] = [p.model_dump() for p in platos]
-                logger.info(f"Datos de platos a sincronizar: {len(platos_data)} items")
-                for p in platos_data:
-                    logger.info(p)
-
-                response = requests.post(
-                    self.sync_platos_url,
-                    json=platos_data,
-                    headers=headers,
-                    timeout=180,
-                )
+                return self._send_platos(platos)
 
-                if response.status_code == 200:
-                    result = response.json()
-                    logger.info(f"Sincronización exitosa. Respuesta: {result}")
-                    return True
-                else:
-                    logger.error(
-                        f"Error en sincronización: {response.status_code} - {response.text}"
-                    )
+        except requests.exceptions.RequestException:
+            # Los errores transitorios ya se reintentaron en el adaptador de la sesión
+            logger.exception("Error HTTP durante la sincronización de platos")
+            return False
+        except Exception:
+            logger.exception("Error inesperado durante la sincronización de platos")
+            return False
+
+    def sync_all(self) -> bool:
+        """
+        Sincroniza mesas y platos usando una sola sesión del navegador.
+
+        Hace login una única vez, extrae las mesas y envía su POST en segundo
+        plano mientras se extraen los platos, de modo que la latencia de red
+        queda oculta detrás del scraping.
+
+        Returns:
+            bool: True si ambas sincronizaciones fueron exitosas, False en caso contrario.
+        """
+        logger.info("Iniciando sincronización de mesas y platos con la API")
+
+        try:
+            with self._page() as domotica, ThreadPoolExecutor(max_workers=1) as executor:
+                if not domotica.login():
+                    logger.error("No se pudo iniciar sesión en Domotica Peru")
+                    # No reutilizar un navegador en estado desconocido
+                    self._discard_page()
                     return False
 
-        except Exception as e:
-            logger.error(f"Error durante la sincronización de platos: {str(e)}")
+                # Las mesas van primero: scrap_productos cierra la sesión al terminar
+                mesas = domotica.scrap_mesas()
+                if mesas:
+                    logger.info("Se extrajeron %d mesas para sincronización", len(mesas))
+                    mesas_future = executor.submit(self._send_mesas, mesas)
+                else:
+                    logger.warning("No se encontraron mesas para sincronizar")
+                    self._expire_page()
+                    mesas_future = None
+
+                platos = domotica.scrap_productos()
+                if platos:
+                    logger.info("Se extrajeron %d platos para sincronización", len(platos))
+                    platos_ok = self._send_platos(platos)
+                else:
+                    logger.warning("No se encontraron platos para sincronizar")
+                    self._expire_page()
+                    platos_ok = False
+
+                mesas_ok = mesas_future.result() if mesas_future else False
+                return mesas_ok and platos_ok
+
+        except requests.exceptions.RequestException:
+            # Los errores transitorios ya se reintentaron en el adaptador de la sesión
+            logger.exception("Error HTTP durante la sincronización de mesas y platos")
+            return False
+        except Exception:
+            logger.exception("Error inesperado durante la sincronización de mesas y platos")
+            return False
+
+    def _send_mesas(self, mesas: List[MesaDomotica]) -> bool:
+        """
+        Envía las mesas extraídas al endpoint de sincronización.
+        """
+        return self._post(self.sync_mesas_url, orjson.dumps([m.model_dump() for m in mesas]))
+
+    def _send_platos(self, platos: List[ProductoDomotica]) -> bool:
+        """
+        Envía los platos extraídos al endpoint de sincronización.
+        """
+        # Diccionarios Python equivalentes a model_dump(), sin el serializador de pydantic
+        platos_data: List[Dict[str, Any]] = [_fast_dump(p) for p in platos]
+        logger.info("Datos de platos a sincronizar: %d items", len(platos_data))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Platos a sincronizar:\n%s", "\n".join(map(repr, platos_data)))
+
+        chunk_size = self.settings.api_sync_chunk_size
+        if chunk_size <= 0 or len(platos_data) <= chunk_size:
+            return self._post(self.sync_platos_url, orjson.dumps(platos_data))
+
+        # Enviar por lotes: memoria acotada y un fallo no invalida los demás lotes
+        total_chunks = (len(platos_data) + chunk_size - 1) // chunk_size
+        ok_chunks = 0
+        for start in range(0, len(platos_data), chunk_size):
+            chunk = platos_data[start:start + chunk_size]
+            try:
+                sent = self._post(self.sync_platos_url, orjson.dumps(chunk))
+            except (requests.exceptions.RequestException, orjson.JSONDecodeError):
+                logger.exception(
+                    "Error de red al enviar el lote de platos %d-%d", start + 1, start + len(chunk)
+                )
+                sent = False
+            if sent:
+                ok_chunks += 1
+            else:
+                logger.error(
+                    "Falló el lote de platos %d-%d de %d",
+                    start + 1,
+                    start + len(chunk),
+                    len(platos_data),
+                )
+
+        logger.info("Lotes de platos sincronizados: %d/%d", ok_chunks, total_chunks)
+        return ok_chunks == total_chunks
+
+    def _post(self, url: str, payload: bytes) -> bool:
+        """
+        Envía un payload JSON ya serializado a un endpoint de sincronización.
+
+        Si ``api_sync_gzip`` está activo, los payloads grandes se comprimen con
+        gzip (nivel 1). Si la API rechaza el cuerpo comprimido (400, 415 o 422)
+        se reenvía sin comprimir y gzip queda desactivado para esta instancia.
+
+        Args:
+            url: Endpoint de destino.
+            payload: Cuerpo JSON codificado.
+
+        Returns:
+            bool: True si la API respondió 200, False en caso contrario.
+        """
+        if self._gzip_enabled and len(payload) > _GZIP_MIN_BYTES:
+            response = self._session.post(
+                url,
+                data=gzip.compress(payload, compresslevel=1),
+                headers={"Content-Encoding": "gzip"},
+                timeout=(10, 180),
+            )
+            if response.status_code in _GZIP_REJECTED_STATUS:
+                logger.warning(
+                    "La API rechazó el cuerpo gzip (%s), reenviando sin comprimir",
+                    response.status_code,
+                )
+                self._gzip_enabled = False
+                response = self._session.post(url, data=payload, timeout=(10, 180))
+        else:
+            response = self._session.post(url, data=payload, timeout=(10, 180))
+
+        if response.status_code == 200:
+            result = orjson.loads(response.content)
+            logger.info("Sincronización exitosa. Respuesta: %s", result)
+            return True
+        else:
+            logger.error(
+                "Error en sincronización: %s - %s", response.status_code, response.text
+            )
             return False
 
     def schedule_daily_sync(self, time_str: str = "00:00") -> bool:
         """
-        Programa una sincronización diaria de platos a la hora especificada.
+        Programa una sincronización diaria de mesas y platos a la hora especificada.
 
         Args:
             time_str: Hora de ejecución en formato "HH:MM". Por defecto "00:00" (medianoche).
@@ -162,9 +405,11 @@ class SchedulerService:
             bool: True si se programó correctamente, False en caso contrario.
         """
         try:
-            logger.info(f"Programando sincronización diaria a las {time_str}")
-            schedule.clear()
-            schedule.every().day.at(time_str).do(self.sync_platos)
+            logger.info("Programando sincronización diaria a las %s", time_str)
+            hour, minute = map(int, time_str.split(":"))
+            if not (0 <= hour < 24 and 0 <= minute < 60):
+                raise ValueError(f"Hora inválida: {time_str}")
+            self._fire_time = (hour, minute)
 
             # Ejecutar inmediatamente la primera sincronización
             # if self.sync_platos():
@@ -177,19 +422,61 @@ class SchedulerService:
             return True
 
         except Exception as e:
-            logger.error(f"Error al programar la sincronización diaria: {str(e)}")
+            logger.error("Error al programar la sincronización diaria: %s", e)
             return False
 
+    def _next_run(self) -> datetime:
+        """
+        Calcula la próxima fecha y hora de la sincronización diaria.
+        """
+        hour, minute = self._fire_time
+        now = datetime.now()
+        target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if target <= now:
+            target += timedelta(days=1)
+        return target
+
     def _run_scheduler(self):
         """
         Método interno para ejecutar el bucle del programador en un hilo separado.
         """
-        self.is_running = True
         logger.info("Iniciando bucle del programador de tareas")
 
-        while self.is_running:
-            schedule.run_pending()
-            time.sleep(60)  # Comprobar cada minuto
+        next_run = self._next_run()
+        while not self._stop_event.is_set():
+            # Dormir hasta la próxima ejecución; stop() despierta el hilo.
+            # El tope de una hora vuelve a calcular la espera si cambia el reloj
+            # del sistema.
+            remaining = (next_run - datetime.now()).total_seconds()
+            if remaining > 0:
+                # Cerrar un navegador dejado por una sincronización manual en cuanto
+                # expire, sin mantener Chrome abierto hasta el próximo despertar
+                self._close_expired_page()
+                timeout = min(remaining, 3600)
+                # Solo acortar la espera hasta la expiración si aún no pasó; si ya
+                # expiró y está en uso, lo cierra quien lo libere (ver _page)
+                page_ttl = self._domotica_expiry - time.monotonic()
+                if self._domotica is not None and page_ttl > 0:
+                    timeout = min(timeout, page_ttl)
+                self._stop_event.wait(timeout=timeout)
+                continue
+
+            self.sync_all()
+            # La próxima ejecución es en un día: no conservar el navegador
+            self._close_page()
+            next_run = self._next_run()
+
+    def _warm_up(self) -> None:
+        """
+        Envía un HEAD a la API para dejar una conexión lista en el pool de la sesión.
+
+        Los errores se ignoran: es solo una optimización y la sincronización
+        abrirá la conexión de todos modos.
+        """
+        try:
+            self._session.head(self.settings.api_base_url, timeout=5)
+        except requests.exceptions.RequestException as e:
+            logger.debug("No se pudo precalentar la conexión con la API: %s", e)
 
     def start(self, time_str: str = "00:00") -> bool:
         """
@@ -210,14 +497,22 @@ class SchedulerService:
             return False
 
         # Iniciar el programador en un hilo separado
-        self.scheduler_thread = threading.Thread(target=self._run_scheduler)
-        self.scheduler_thread.daemon = (
-            True  # El hilo terminará cuando el programa principal termine
+        self._stop_event.clear()
+        # El hilo no se fija a una CPU con os.sched_setaffinity: en Linux la
+        # afinidad del hilo la heredan los procesos que lanza, y el Chrome de
+        # sync_all quedaría limitado a un solo núcleo
+        self.scheduler_thread = threading.Thread(
+            target=self._run_scheduler,
+            name="SchedulerLoop",
+            daemon=True,  # El hilo terminará cuando el programa principal termine
         )
         self.scheduler_thread.start()
 
+        # Resolver DNS y abrir la conexión con la API en segundo plano
+        threading.Thread(target=self._warm_up, name="SchedulerWarmUp", daemon=True).start()
+
         logger.info(
-            f"Servicio de programación iniciado. Sincronización diaria a las {time_str}"
+            "Servicio de programación iniciado. Sincronización diaria a las %s", time_str
         )
         return True
 
@@ -232,9 +527,21 @@ class SchedulerService:
             logger.warning("El servicio de programación no está en ejecución")
             return False
 
-        self.is_running = False
+        self._stop_event.set()
         if self.scheduler_thread and self.scheduler_thread.is_alive():
             self.scheduler_thread.join(5)  # Esperar hasta 5 segundos a que termine
 
+        self.close()
         logger.info("Servicio de programación detenido")
         return True
+
+    def close(self) -> None:
+        """
+        Cierra la sesión HTTP, sus conexiones abiertas y el navegador cacheado.
+        """
+        # Esperar a que termine una sincronización en curso antes de cerrar
+        # el navegador y la sesión HTTP que está usando
+        if self._domotica_lock.locked():
+            logger.info("Esperando a que termine la sincronización en curso...")
+        self._close_page()
+        self._session.close()
@@ -0,0 +1,48 @@
+"""
+Pruebas unitarias para el servicio de sincronización programada.
+"""
+
+import os
+import unittest
+
+# Variables obligatorias de Settings para poder importar el servicio
+for _name in ("API_BASE_URL", "DOMOTICA_BASE_URL", "DOMOTICA_USERNAME", "DOMOTICA_PASSWORD"):
+    os.environ.setdefault(_name, "test")
+
+from src.model.schemas import ProductoDomotica  # noqa: E402
+from src.service.scheduler_service import _fast_dump  # noqa: E402
+
+
+class FastDumpTest(unittest.TestCase):
+    """Verifica que _fast_dump sea equivalente a model_dump()."""
+
+    def test_todos_los_campos(self):
+        producto = ProductoDomotica(
+            categoria="CEVICHES",
+            nombre="CEVICHE NORTENO",
+            stock="1",
+            precio="35.00",
+            comentario="Sin cebolla",
+        )
+        self.assertEqual(_fast_dump(producto), producto.model_dump())
+
+    def test_campos_opcionales_en_none(self):
+        producto = ProductoDomotica(
+            categoria="PIQUEOS",
+            nombre="CHOROS A LA CHALACA",
+            stock="1",
+            precio="30.00",
+        )
+        self.assertIsNone(producto.comentario)
+        self.assertEqual(_fast_dump(producto), producto.model_dump())
+
+    def test_model_construct(self):
+        # Los productos del scraping se crean con model_construct
+        producto = ProductoDomotica.model_construct(
+            categoria="BEBIDAS", nombre="PILSEN CALLAO 630ML", stock="22", precio="13.00"
+        )
+        self.assertEqual(_fast_dump(producto), producto.model_dump())
+
+
+if __name__ == "__main__":
+    unittest.main()